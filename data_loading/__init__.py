@@ -1,25 +1,96 @@
-# basic imports
-from data_loading.data_loader import DataLoader
-from data_loading.dataset import AbstractDataset, IterableDataset, DictDataset, BaseCacheDataset, \
-    BaseExtendCacheDataset, BaseLazyDataset, ConcatDataset, Nii3DCacheDatset, \
-    Nii3DLazyDataset
-from data_loading.augmenter import Augmenter
-from data_loading.data_manager import DataManager
-from data_loading.load_utils import  LoadSample, LoadSampleLabel
+import importlib
 
-from data_loading.sampler import *
+# all public names and the modules they are imported from; the modules are
+# only imported once a name is accessed for the first time (PEP 562), since
+# most of them pull in heavy dependencies (e.g. scikit-image, SimpleITK,
+# torch or numba)
+_LAZY = {
+    # basic imports
+    "DataLoader": "data_loading.data_loader",
+    "AbstractDataset": "data_loading.dataset",
+    "IterableDataset": "data_loading.dataset",
+    "DictDataset": "data_loading.dataset",
+    "BaseCacheDataset": "data_loading.dataset",
+    "BaseExtendCacheDataset": "data_loading.dataset",
+    "BaseLazyDataset": "data_loading.dataset",
+    "ConcatDataset": "data_loading.dataset",
+    "Nii3DCacheDatset": "data_loading.dataset",
+    "Nii3DLazyDataset": "data_loading.dataset",
+    "Augmenter": "data_loading.augmenter",
+    "DataManager": "data_loading.data_manager",
+    "LoadSample": "data_loading.load_utils",
+    "LoadSampleLabel": "data_loading.load_utils",
 
+    # samplers
+    "AbstractSampler": "data_loading.sampler",
+    "LambdaSampler": "data_loading.sampler",
+    "RandomSampler": "data_loading.sampler",
+    "PerClassRandomSampler": "data_loading.sampler",
+    "StoppingPerClassRandomSampler": "data_loading.sampler",
+    "SequentialSampler": "data_loading.sampler",
+    "PerClassSequentialSampler": "data_loading.sampler",
+    "StoppingPerClassSequentialSampler": "data_loading.sampler",
+    "WeightedRandomSampler": "data_loading.sampler",
+    "WeightedPrevalenceRandomSampler": "data_loading.sampler",
+    "BatchSampler": "data_loading.sampler",
+}
 
-from delira import get_backends as _get_backends
+# names depending on optional packages; only available if the corresponding
+# package (torch or numba) is installed
+_OPTIONAL = {
+    "TorchvisionClassificationDataset": "data_loading.dataset",
+    "NumbaTransform": "data_loading.numba_transform",
+    "NumbaTransformWrapper": "data_loading.numba_transform",
+    "NumbaCompose": "data_loading.numba_transform",
+}
 
-# If torch backend is available: Import Torchvision dataset
-if "TORCH" in _get_backends():
-    from data_loading.dataset import TorchvisionClassificationDataset
+__all__ = list(_LAZY.keys())
 
 
-# if numba is installed: Import Numba Transforms
-try:
-    from delira.data_loading.numba_transform import NumbaTransform, \
-        NumbaTransformWrapper, NumbaCompose
-except ImportError:
-    pass
+def __getattr__(name):
+    """
+    Imports the module of a public name on first access and caches the
+    imported object in the package namespace
+
+    Parameters
+    ----------
+    name : str
+        the name to access
+
+    Returns
+    -------
+    Any
+        the imported object
+
+    Raises
+    ------
+    AttributeError
+        if the name is unknown or its optional dependency is not installed
+    ImportError
+        if a required dependency is not installed
+
+    """
+    if name in _LAZY:
+        val = getattr(importlib.import_module(_LAZY[name]), name)
+
+    elif name in _OPTIONAL:
+        try:
+            val = getattr(importlib.import_module(_OPTIONAL[name]), name)
+        except ImportError as e:
+            raise AttributeError("%s is not available, since an optional "
+                                 "dependency is missing: %s"
+                                 % (name, str(e)))
+
+    else:
+        raise AttributeError("module %r has no attribute %r"
+                             % (__name__, name))
+
+    globals()[name] = val
+    return val
+
+
+def __dir__():
+    # optional names are only listed once they have been imported, since
+    # accessing them fails if their dependency is missing (e.g. when
+    # collecting unittests)
+    return sorted(set(globals().keys()) | set(_LAZY.keys()))
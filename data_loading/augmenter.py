@@ -1,15 +1,124 @@
 import multiprocessing
 from multiprocessing import connection as mpconnection
-from collections import Callable
+from collections import deque
+from collections.abc import Callable
 import abc
+import functools
 import os
+import queue
+import threading
+import time
 import numpy as np
 import random
 
 from data_loading.sampler import AbstractSampler, BatchSampler
-from data_loading.data_loader import DataLoader
+from data_loading.data_loader import DataLoader, PinnedBatch
+from data_loading.bump_allocator import BumpAllocator
+from data_loading.shared_memory_pool import SharedMemorySegmentPool, \
+    SegmentDescriptor
 from delira import get_current_debug_mode
 
+# suggested size of each shared memory segment used to transport batches;
+# shared memory transport is disabled by default
+DEFAULT_SHARED_MEMORY_SIZE = 32 * 1024 * 1024
+# default size of each worker's arena to allocate the loaded batches from
+DEFAULT_ARENA_SIZE = 32 * 1024 * 1024
+# number of additional segments for batches still held by the consumer
+_NUM_CONSUMER_SEGMENTS = 2
+# smoothing factor of the moving average over each worker's service time
+_SERVICE_TIME_SMOOTHING = 0.2
+# time (in seconds) to wait for workers to terminate before killing them
+_SHUTDOWN_TIMEOUT = 5.
+# marks the end of the batches produced by a background thread
+_END_OF_BATCHES = object()
+
+
+def _to_channels_last(data):
+    """
+    Moves the channel axis (the second one) of all numeric arrays with at
+    least four dimensions to the end (e.g. from NCHW to NHWC); arrays with
+    fewer dimensions (e.g. segmentation maps of shape NHW) have no channel
+    axis and are kept as they are
+
+    Parameters
+    ----------
+    data : dict
+        the batch
+
+    Returns
+    -------
+    dict
+        the batch with contiguous channels-last arrays
+
+    """
+    for key, val in data.items():
+        if isinstance(val, np.ndarray) and val.ndim >= 4 and \
+                not val.dtype.hasobject:
+            data[key] = np.ascontiguousarray(np.moveaxis(val, 1, -1))
+    return data
+
+
+def _pack_indices(batches):
+    """
+    Packs a group of index batches into raw bytes, which can be sent through
+    a pipe as a single message without pickling. The packed message consists
+    of the number of batches, the length of each batch and all indices
+
+    Parameters
+    ----------
+    batches : list
+        the batches of (integer) indices
+
+    Returns
+    -------
+    bytes
+        the packed indices
+
+    Raises
+    ------
+    TypeError
+        if a batch contains non-integer indices
+
+    """
+    header = [len(batches)] + [len(idxs) for idxs in batches]
+    parts = [np.asarray(header, dtype=np.int64)]
+
+    for idxs in batches:
+        idxs = np.asarray(idxs)
+
+        # other indices would be truncated silently
+        if idxs.size and not np.issubdtype(idxs.dtype, np.integer):
+            raise TypeError("Indices must be integers, but got %s"
+                            % idxs.dtype)
+
+        parts.append(idxs.astype(np.int64, copy=False))
+
+    return np.concatenate(parts).tobytes()
+
+
+def _unpack_indices(buffer):
+    """
+    Restores a group of index batches packed by :func:`_pack_indices`
+
+    Parameters
+    ----------
+    buffer : bytes
+        the packed indices
+
+    Returns
+    -------
+    list
+        the batches of indices
+
+    """
+    packed = np.frombuffer(buffer, dtype=np.int64)
+    num_batches = int(packed[0])
+    lengths = packed[1:num_batches + 1]
+
+    offsets = np.cumsum(lengths) + num_batches + 1
+    return [packed[end - length:end].tolist()
+            for length, end in zip(lengths, offsets)]
+
 
 class _WorkerProcess(multiprocessing.Process):
     """
@@ -20,8 +129,14 @@ class _WorkerProcess(multiprocessing.Process):
                  output_pipe: mpconnection.Connection,
                  index_pipe: mpconnection.Connection,
                  abort_event: multiprocessing.Event,
+                 abort_pipe: mpconnection.Connection,
                  transforms: Callable,
-                 process_id):
+                 process_id,
+                 segment_pool: SharedMemorySegmentPool = None,
+                 arena_size=None,
+                 seed: np.random.SeedSequence = None,
+                 cpus=None,
+                 channels_last=False):
         """
 
         Parameters
@@ -32,14 +147,38 @@ class _WorkerProcess(multiprocessing.Process):
         output_pipe : :class:`multiprocessing.connection.Connection`
             the pipe, the loaded data shoud be sent to
         index_pipe : :class:`multiprocessing.connection.Connection`
-            the pipe to accept the indices
+            the pipe to accept the indices (packed by :func:`_pack_indices`);
+            the batches of each message are sent back as a list in a single
+            message
         abort_event : class:`multiprocessing.Event`
             the abortion event; will be set for every Exception;
             If set: Worker terminates
-        transforms : :class:`collections.Callable`
+        abort_pipe : :class:`multiprocessing.connection.Connection`
+            a pipe, which becomes readable if the workers should abort;
+            allows to block while waiting for indices without polling the
+            abortion event
+        transforms : :class:`collections.abc.Callable`
             the transforms to transform the data
         process_id : int
             the process id
+        segment_pool : :class:`SharedMemorySegmentPool`
+            the pool of shared memory segments to transport the loaded data;
+            if None or if the data does not fit into a segment, the data is
+            sent through the output pipe directly
+        arena_size : int
+            the size (in bytes) of the worker's arena to allocate the loaded
+            batches from; if None: no arena is used
+        seed : :class:`numpy.random.SeedSequence`
+            the worker's own seed sequence to seed :mod:`numpy.random` and
+            :mod:`random` with; if None: the random states inherited from the
+            main process are used
+        cpus : set
+            the CPU cores to pin the worker to; if None: the worker is not
+            pinned
+        channels_last : bool
+            whether to move the channel axis of the transformed batches to the
+            end (see :func:`_to_channels_last`); fused into the copy to the
+            shared memory if possible
         """
         super().__init__()
 
@@ -47,36 +186,82 @@ class _WorkerProcess(multiprocessing.Process):
         self._output_pipe = output_pipe
         self._input_pipe = index_pipe
         self._abort_event = abort_event
+        self._abort_pipe = abort_pipe
         self._process_id = process_id
         self._transforms = transforms
+        self._segment_pool = segment_pool
+        self._arena_size = arena_size
+        self._seed = seed
+        self._cpus = cpus
+        self._channels_last = channels_last
 
     def run(self) -> None:
         # set the process id
         self._data_loader.process_id = self._process_id
 
+        # pin the worker to keep its caches warm
+        if self._cpus is not None:
+            try:
+                os.sched_setaffinity(0, self._cpus)
+            except (AttributeError, OSError):
+                # not supported on this platform or invalid cores
+                pass
+
+        # seed each worker differently to avoid identical augmentations
+        if self._seed is not None:
+            np_seed, random_seed = self._seed.generate_state(2)
+            np.random.seed(np_seed)
+            random.seed(int(random_seed))
+
+        # allocate the arena inside the worker process only
+        if self._arena_size is not None:
+            self._data_loader.arena = BumpAllocator(self._arena_size)
+
         try:
             while True:
+                # block until indices or the abortion signal arrive
+                ready = mpconnection.wait([self._input_pipe,
+                                           self._abort_pipe])
+
                 # check if worker should terminate
-                if self._abort_event.is_set():
+                if self._abort_pipe in ready or self._abort_event.is_set():
                     raise RuntimeError("Abort Event has been set externally")
 
-                # get indices if available (with timeout to frequently check
-                # for abortions
-                if self._input_pipe.poll(timeout=0.2):
-                    idxs = self._input_pipe.recv()
+                buffer = self._input_pipe.recv_bytes()
 
-                    # final indices -> shutdown workers
-                    if idxs is None:
-                        break
+                # empty message -> shutdown workers
+                if not buffer:
+                    break
 
+                batches = []
+                for idxs in _unpack_indices(buffer):
                     # load data
                     data = self._data_loader(idxs)
 
-                    #
+                    # transform data if transforms given
                     if self._transforms is not None:
                         data = self._transforms(**data)
 
-                    self._output_pipe.send(data)
+                    # write arrays to shared memory and send only a small
+                    # descriptor if possible
+                    descriptor = None
+                    if self._segment_pool is not None:
+                        descriptor = self._segment_pool.write(
+                            data, channels_last=self._channels_last)
+
+                    if descriptor is not None:
+                        data = descriptor
+                    elif self._channels_last:
+                        data = _to_channels_last(data)
+
+                    batches.append(data)
+
+                # report all batches of the message at once
+                self._output_pipe.send(batches)
+
+                # the batches have been copied or pickled; free their memory
+                if self._data_loader.arena is not None:
+                    self._data_loader.arena.reset()
 
         except Exception as e:
             self._abort_event.set()
@@ -89,7 +274,7 @@ class AbstractAugmenter(object):
     """
 
     def __init__(self, data_loader, sampler, transforms=None, seed=1,
-                 drop_last=False):
+                 drop_last=False, batch_size=1, channels_last=False):
         """
 
         Parameters
@@ -99,12 +284,19 @@ class AbstractAugmenter(object):
         sampler : :class:`AbstractSampler`
             the sampler (may be batch sampler or usual sampler), defining the
             actual sampling strategy; Is an iterable yielding indices
-        transforms : :class:`collections.Callable`
+        transforms : :class:`collections.abc.Callable`
             the transforms to apply; defaults to None
         seed : int
             the basic seed; default: 1
         drop_last : bool
             whether to drop the last (possibly smaller) batch or not
+        batch_size : int
+            the number of samples per batch; only used if ``sampler`` is no
+            batch sampler
+        channels_last : bool
+            whether to move the channel axis (the second one) of all arrays
+            with at least four dimensions to the end after applying the
+            transforms (e.g. NCHW to NHWC)
 
         """
 
@@ -112,7 +304,8 @@ class AbstractAugmenter(object):
 
         if not isinstance(sampler, BatchSampler):
             if isinstance(sampler, AbstractSampler):
-                sampler = BatchSampler
+                sampler = BatchSampler(sampler, batch_size,
+                                       truncate=drop_last)
             else:
                 raise ValueError("Invalid Sampler given: %s" % str(sampler))
 
@@ -122,23 +315,37 @@ class AbstractAugmenter(object):
 
         self._transforms = transforms
         self._seed = seed
+        self._channels_last = channels_last
 
         # seed numpy.random and random as these are the random number
         # generators, which might be used for sampling
         np.random.seed(seed)
-        random.seed = seed
+        random.seed(seed)
 
     @abc.abstractmethod
     def __iter__(self):
         raise NotImplementedError
 
+    def close(self):
+        """
+        Releases all resources held by the augmenter
+
+        """
+        pass
+
 
 class _ParallelAugmenter(AbstractAugmenter):
     """
     An Augmenter that loads and augments multiple batches in parallel
     """
     def __init__(self, data_loader, sampler, num_processes=None,
-                 transforms=None, seed=1, drop_last=False):
+                 transforms=None, seed=1, drop_last=False, batch_size=1,
+                 channels_last=False,
+                 shared_memory_size=None,
+                 persistent_workers=False, arena_size=DEFAULT_ARENA_SIZE,
+                 prefetch_factor=2, coalesce_max_batches=1,
+                 coalesce_window_ms=0, seed_sequence=None, pin_workers=False,
+                 cpu_set=None, prefetch=0):
         """
 
         Parameters
@@ -152,31 +359,98 @@ class _ParallelAugmenter(AbstractAugmenter):
             the number of processes to use for dataloading + augmentation;
             if None: the number of available CPUs will be used as number of
             processes
-        transforms : :class:`collections.Callable`
+        transforms : :class:`collections.abc.Callable`
             the transforms to apply; defaults to None
         seed : int
             the basic seed; default: 1
         drop_last : bool
             whether to drop the last (possibly smaller) batch or not
+        batch_size : int
+            the number of samples per batch; only used if ``sampler`` is no
+            batch sampler
+        channels_last : bool
+            whether to move the channel axis (the second one) of all arrays
+            with at least four dimensions to the end after applying the
+            transforms (e.g. NCHW to NHWC)
+        shared_memory_size : int
+            the size (in bytes) of each shared memory segment used to
+            transport batches from the workers; larger batches are sent
+            through pipes. If None: shared memory transport is disabled.
+            The segments occupy ``shared_memory_size * (num_processes *
+            prefetch_factor + prefetch + 2)`` bytes of ``/dev/shm``, which
+            must be large enough (e.g. docker only provides 64 MB by
+            default); otherwise the workers are killed by SIGBUS
+        persistent_workers : bool
+            whether to keep the worker processes alive between epochs; if
+            True, they are only shut down by :meth:`close`
+        arena_size : int
+            the size (in bytes) of each worker's arena, which the loaded
+            batches are allocated from; If None: batches are allocated
+            individually
+        prefetch_factor : int
+            the number of batches enqueued to each worker in advance; bounds
+            the number of batches in flight (and thus the memory used for
+            them) to ``num_processes * prefetch_factor``
+        coalesce_max_batches : int
+            the maximum number of batches sent to a worker (and back) in a
+            single message, which reduces the number of messages for small
+            batches at the cost of latency
+        coalesce_window_ms : float
+            the maximum time (in milliseconds) to hold back batches, while
+            waiting for enough free slots to send ``coalesce_max_batches``
+            batches at once; if 0: batches are sent whenever a slot is free
+        seed_sequence : :class:`numpy.random.SeedSequence`
+            the sequence to spawn the workers' seeds from; new seeds are
+            spawned whenever the workers are (re-)started. If None: a sequence
+            is created from ``seed``
+        pin_workers : bool
+            whether to pin each worker to a single CPU core (round robin over
+            ``cpu_set``), which avoids migrating the workers between cores
+        cpu_set : iterable
+            the CPU cores to pin the workers to; allows to keep the workers
+            away from the cores used for training. If None: all cores
+            available to the main process are used
+        prefetch : int
+            the number of received batches the consumer keeps ready in
+            advance (see :class:`Augmenter`); each of them holds its own
+            shared memory segment
 
         """
 
-        super().__init__(data_loader, sampler, transforms, seed, drop_last)
+        super().__init__(data_loader, sampler, transforms, seed, drop_last,
+                         batch_size, channels_last)
 
         if num_processes is None:
             num_processes = os.cpu_count()
 
         self._num_processes = num_processes
+        self._shared_memory_size = shared_memory_size
+        self._segment_pool = None
+        self._persistent_workers = persistent_workers
+        self._arena_size = arena_size
+        self._prefetch_factor = prefetch_factor
+        self._prefetch = prefetch
+        self._coalesce_max_batches = max(coalesce_max_batches, 1)
+        self._coalesce_window = coalesce_window_ms / 1000.
+
+        if seed_sequence is None:
+            seed_sequence = np.random.SeedSequence(seed)
+        self._seed_sequence = seed_sequence
+        self._pin_workers = pin_workers
+        self._cpu_set = cpu_set
 
         self._processes = []
 
         self._index_pipes = []
         self._data_pipes = []
+        self._pipe_to_worker = {}
 
-        self._index_pipe_counter = 0
-        self._data_pipe_counter = 0
         self._abort_event = None
+        self._abort_conn = None
         self._data_queued = []
+        self._send_times = []
+        self._last_receive_times = []
+        self._service_times = []
         self._processes_running = False
 
     @property
@@ -209,6 +483,29 @@ class _ParallelAugmenter(AbstractAugmenter):
 
         self._abort_event = new_event
 
+    def _worker_cpus(self):
+        """
+        Determines the CPU cores to pin each worker to
+
+        Returns
+        -------
+        list
+            a set of cores for each worker or None for each worker if the
+            workers should not be pinned
+
+        """
+        if not self._pin_workers:
+            return [None] * self._num_processes
+
+        if self._cpu_set is not None:
+            cores = sorted(self._cpu_set)
+        elif hasattr(os, "sched_getaffinity"):
+            cores = sorted(os.sched_getaffinity(0))
+        else:
+            cores = list(range(os.cpu_count()))
+
+        return [{cores[i % len(cores)]} for i in range(self._num_processes)]
+
     def _start_processes(self):
         """
         Starts new processes and pipes for interprocess communication
@@ -217,6 +514,20 @@ class _ParallelAugmenter(AbstractAugmenter):
 
         # reset abortion event
         self.abort_event = multiprocessing.Event()
+        # pipe to wake up all workers on abortion; shared by all workers
+        abort_recv_conn, self._abort_conn = multiprocessing.Pipe(duplex=False)
+
+        # each batch in flight, each batch prefetched by the consumer and the
+        # batches currently held by the consumer need their own segment
+        if self._shared_memory_size is not None:
+            num_segments = self._num_processes * self._prefetch_factor + \
+                self._prefetch + _NUM_CONSUMER_SEGMENTS
+            self._segment_pool = SharedMemorySegmentPool(
+                self._shared_memory_size, num_segments)
+
+        # independent random streams for all workers
+        worker_seeds = self._seed_sequence.spawn(self._num_processes)
+        worker_cpus = self._worker_cpus()
 
         # for each process do:
         for i in range(self._num_processes):
@@ -231,83 +542,176 @@ class _ParallelAugmenter(AbstractAugmenter):
                                      index_pipe=recv_conn_in,
                                      transforms=self._transforms,
                                      abort_event=self._abort_event,
-                                     process_id=i)
+                                     abort_pipe=abort_recv_conn,
+                                     process_id=i,
+                                     segment_pool=self._segment_pool,
+                                     arena_size=self._arena_size,
+                                     seed=worker_seeds[i],
+                                     cpus=worker_cpus[i],
+                                     channels_last=self._channels_last)
 
             # make the process daemonic and start it
             process.daemon = True
             process.start()
 
+            # close the worker's ends of the pipes in the main process, so
+            # that a terminated worker is noticed as EOF on its data pipe
+            send_conn_out.close()
+            recv_conn_in.close()
+
             # append process and pipes to list
             self._processes.append(process)
             self._index_pipes.append(send_conn_in),
             self._data_pipes.append(recv_conn_out)
+            self._pipe_to_worker[recv_conn_out] = i
             self._data_queued.append(0)
+            self._send_times.append(deque())
+            self._last_receive_times.append(0.)
+            self._service_times.append(None)
             self._processes_running = True
 
+        abort_recv_conn.close()
+
+    def _abort(self):
+        """
+        Sets the abortion event and wakes up all workers waiting for indices
+
+        """
+        self._abort_event.set()
+
+        try:
+            self._abort_conn.send(None)
+        except OSError:
+            # all workers have already terminated
+            pass
+
     def _shutdown_processes(self):
         """
         Shuts down the processes and resets all related flags and counters
 
         """
 
-        # shutdown workers by setting abortion event
-        if not self._abort_event.is_set():
-            self._abort_event.set()
+        try:
+            # receive pending batches first, since workers might block while
+            # sending them; skipped if shutting down due to an error
+            if not self._abort_event.is_set():
+                self._drain()
+        except (EOFError, OSError, RuntimeError):
+            # a worker terminated unexpectedly or has been aborted
+            self._abort()
+        finally:
+            self._release_processes()
 
-        # for each process:
-        for _data_conn, _index_conn, _process in zip(self._data_pipes,
-                                                     self._index_pipes,
-                                                     self._processes):
+    def _release_processes(self):
+        """
+        Terminates the processes and releases all related resources,
+        flags and counters
 
-            # send None to worker
-            _index_conn.send(None)
-            # Close Process and wait for its termination
+        """
+        # broadcast shutdown (an empty message) to all workers
+        for _index_conn in self._index_pipes:
+            try:
+                _index_conn.send_bytes(b"")
+            except OSError:
+                # worker has already terminated
+                pass
+
+        # wait for the workers to terminate and kill the remaining ones
+        deadline = time.monotonic() + _SHUTDOWN_TIMEOUT
+        for _process in self._processes:
+            _process.join(timeout=max(deadline - time.monotonic(), 0))
+
+        for _process in self._processes:
+            if _process.is_alive():
+                _process.terminate()
+                _process.join()
             _process.close()
-            _process.join()
 
-            # close connections
-            _index_conn.close()
-            _data_conn.close()
+        # close connections
+        for _conn in self._index_pipes + self._data_pipes:
+            _conn.close()
+        self._abort_conn.close()
 
-            # pop corresponing pipes, counters and processes from lists
-            self._data_pipes.pop()
-            self._data_queued.pop()
-            self._index_pipes.pop()
-            self._processes.pop()
+        self._processes.clear()
+        self._index_pipes.clear()
+        self._data_pipes.clear()
+        self._data_queued.clear()
 
-        # reset running process flag and counters
-        self._processes_running = False
-        self._data_pipe_counter = 0
-        self._index_pipe_counter = 0
+        if self._segment_pool is not None:
+            self._segment_pool.close()
+            self._segment_pool = None
 
-    @property
-    def _next_index_pipe(self):
-        """
-        Property implementing switch to next index pipe
+        self._pipe_to_worker.clear()
+        self._send_times.clear()
+        self._last_receive_times.clear()
+        self._service_times.clear()
 
+        # reset running process flag
+        self._processes_running = False
+
+    def _least_loaded_worker(self):
         """
-        ctr = self._index_pipe_counter
-        new_ctr = (self._index_pipe_counter + 1) % self._num_processes
-        self._index_pipe_counter = new_ctr
+        Determines the worker with the least expected load (longest
+        processing time heuristic): the number of batches queued for each
+        worker weighted by its average service time. Workers without any
+        measured service time are assumed to be as fast as the average worker
 
-        return ctr
+        Returns
+        -------
+        int
+            the index of the least loaded worker
 
-    @property
-    def _next_data_pipe(self):
         """
-        Property implementing switch to next data pipe
-
+        known_times = [_time for _time in self._service_times
+                       if _time is not None]
+        if known_times:
+            default_time = sum(known_times) / len(known_times)
+        else:
+            default_time = 1.
+
+        def expected_load(worker):
+            service_time = self._service_times[worker]
+            if service_time is None:
+                service_time = default_time
+            return (self._data_queued[worker] + 1) * service_time
+
+        return min(range(self._num_processes), key=expected_load)
+
+    def _update_service_time(self, worker, num_batches=1):
         """
-        ctr = self._data_pipe_counter
-        new_ctr = (self._data_pipe_counter + 1) % self._num_processes
-        self._data_pipe_counter = new_ctr
+        Updates the moving average of the (per batch) service time of a
+        worker after receiving a message from it
 
-        return ctr
+        Parameters
+        ----------
+        worker : int
+            the index of the worker, the message has been received from
+        num_batches : int
+            the number of batches contained in the message
+
+        """
+        now = time.monotonic()
+        send_time = self._send_times[worker].popleft()
+
+        # the worker started processing the message after it has been sent
+        # and after the previous message of this worker has been finished
+        service_time = (now - max(send_time,
+                                  self._last_receive_times[worker])) \
+            / num_batches
+        self._last_receive_times[worker] = now
+
+        old_time = self._service_times[worker]
+        if old_time is None:
+            self._service_times[worker] = service_time
+        else:
+            self._service_times[worker] = old_time + _SERVICE_TIME_SMOOTHING \
+                * (service_time - old_time)
 
     def _enqueue_indices(self, sample_idxs):
         """
-        Enqueues a set of indices to workers while iterating over workers in
-        cyclic way
+        Enqueues a set of indices to workers while always choosing the least
+        loaded worker. Up to ``coalesce_max_batches`` consecutive batches are
+        sent to the same worker in a single message
 
         Parameters
         ----------
@@ -316,55 +720,97 @@ class _ParallelAugmenter(AbstractAugmenter):
 
         """
 
-        # iterating over all batch indices
-        for idxs in sample_idxs:
-            # switch to next counter
-            index_pipe_ctr = self._next_index_pipe
+        # iterating over all groups of batch indices
+        for start in range(0, len(sample_idxs), self._coalesce_max_batches):
+            group = sample_idxs[start:start + self._coalesce_max_batches]
+            # switch to least loaded worker
+            worker = self._least_loaded_worker()
             # increase number of queued batches for current worker
-            self._data_queued[index_pipe_ctr] += 1
+            self._data_queued[worker] += len(group)
+            self._send_times[worker].append(time.monotonic())
             # enqueue indices to worker
-            self._index_pipes[index_pipe_ctr].send(idxs)
+            self._index_pipes[worker].send_bytes(_pack_indices(group))
 
-    def _receive_data(self):
+    def _receive_data(self, timeout=None):
         """
-        Receives data from worker
+        Receives data from whichever worker finished first
 
-        """
-        # switching to next worker
-        _data_pipe = self._next_data_pipe
+        Parameters
+        ----------
+        timeout : float
+            the maximum time (in seconds) to wait for any worker; if None:
+            blocks until data is available
 
-        # switch to next worker while worker does not have any data enqueued
-        while not self._data_queued[_data_pipe]:
-            _data_pipe = self._next_data_pipe
+        Returns
+        -------
+        list
+            the batches received in a single message; empty if the timeout
+            expired
+
+        """
+        # block until any worker has data ready
+        ready = mpconnection.wait(self._data_pipes, timeout)
+        if not ready:
+            return []
+        _data_pipe = ready[0]
 
         # receive data from worker
-        data = self._data_pipes[_data_pipe].recv()
+        try:
+            batches = _data_pipe.recv()
+        except EOFError:
+            # the worker terminated after setting the abortion event
+            if self.abort_event.is_set():
+                raise RuntimeError("Abort Event was set in one of the "
+                                   "workers")
+            raise
         # decrease number of enqueued batches for current worker
-        self._data_queued[_data_pipe] -= 1
+        worker = self._pipe_to_worker[_data_pipe]
+        self._data_queued[worker] -= len(batches)
+        self._update_service_time(worker, len(batches))
+
+        # restore the batches from shared memory
+        return [self._segment_pool.read(data)
+                if isinstance(data, SegmentDescriptor) else data
+                for data in batches]
+
+    def _drain(self):
+        """
+        Receives and discards all batches still enqueued to the workers,
+        which is necessary to keep the workers alive for the next epoch if
+        the current one has not been fully consumed
 
-        return data
+        """
+        while any(self._data_queued):
+            self._receive_data()
+
+    def close(self):
+        """
+        Shuts down the worker processes if they are still running
+
+        """
+        if getattr(self, "_processes_running", False):
+            self._shutdown_processes()
+
+    def __del__(self):
+        self.close()
 
     def __iter__(self):
-        # start processes
-        self._start_processes()
-        _index_pipe = self._next_index_pipe
+        # start processes if they are not kept alive from the last epoch
+        if not self._processes_running:
+            self._start_processes()
 
         # create sampler iterator
         sampler_iter = iter(self._sampler)
         all_sampled = False
 
-        try:
-            # start by enqueuing two items per process as buffer
-            _indices = []
-            try:
-                for i in range(self._num_processes * 2):
-                    idxs = next(sampler_iter)
-                    _indices.append(idxs)
-            except StopIteration:
-                all_sampled = True
+        # maximum number of batches enqueued to the workers at once
+        max_in_flight = self._num_processes * self._prefetch_factor
 
-            self._enqueue_indices(_indices)
+        # sampled batches held back to be sent together with the next ones
+        _indices = []
+        held_since = None
 
+        try:
             # iterate while not all data has been sampled and any data is
             # enqueued
             while True:
@@ -374,30 +820,63 @@ class _ParallelAugmenter(AbstractAugmenter):
                     raise RuntimeError("Abort Event was set in one of the "
                                        "workers")
 
-                # enqueue additional indices if sampler was not already
+                # top up the batches in flight if sampler was not already
                 # exhausted
+                num_in_flight = sum(self._data_queued)
                 try:
-                    if not all_sampled:
-                        idxs = next(sampler_iter)
-                        self._enqueue_indices(idxs)
+                    while not all_sampled and \
+                            num_in_flight + len(_indices) < max_in_flight:
+                        _indices.append(next(sampler_iter))
                 except StopIteration:
                     all_sampled = True
 
+                # send full groups only and hold back the remaining batches
+                # until the batching window expires; nothing is held back if
+                # the workers would idle otherwise
+                num_send = len(_indices)
+                if not all_sampled and num_in_flight and \
+                        self._coalesce_max_batches > 1:
+                    if held_since is None:
+                        held_since = time.monotonic()
+                    if time.monotonic() - held_since < self._coalesce_window:
+                        num_send -= num_send % self._coalesce_max_batches
+
+                self._enqueue_indices(_indices[:num_send])
+                _indices = _indices[num_send:]
+
+                timeout = None
+                if _indices:
+                    held_until = held_since + self._coalesce_window
+                    timeout = max(held_until - time.monotonic(), 0)
+                else:
+                    held_since = None
+
                 # receive data from workers
                 if any(self._data_queued):
-                    yield self._receive_data()
+                    yield from self._receive_data(timeout)
                 else:
                     break
 
         except Exception as e:
-            # set abort event to shutdown workers
-            self._abort_event.set()
+            # abort workers to shut them down
+            self._abort()
             raise e
 
         finally:
-            # shutdown processes
             if self._processes_running:
-                self._shutdown_processes()
+                # keep workers alive for the next epoch unless an error
+                # occurred
+                if self._persistent_workers and \
+                        not self._abort_event.is_set():
+                    try:
+                        self._drain()
+                    except Exception:
+                        # a worker failed on a batch which has not been
+                        # requested anymore; restart all workers next epoch
+                        self._abort()
+                        self._shutdown_processes()
+                else:
+                    self._shutdown_processes()
 
 
 class _SequentialAugmenter(AbstractAugmenter):
@@ -406,7 +885,7 @@ class _SequentialAugmenter(AbstractAugmenter):
     parallelism
     """
     def __init__(self, data_loader, sampler, transforms=None, seed=1,
-                 drop_last=False):
+                 drop_last=False, batch_size=1, channels_last=False):
         """
 
         Parameters
@@ -416,16 +895,24 @@ class _SequentialAugmenter(AbstractAugmenter):
         sampler : :class:`AbstractSampler`
             the sampler (may be batch sampler or usual sampler), defining the
             actual sampling strategy; Is an iterable yielding indices
-        transforms : :class:`collections.Callable`
+        transforms : :class:`collections.abc.Callable`
             the transforms to apply; defaults to None
         seed : int
             the basic seed; default: 1
         drop_last : bool
             whether to drop the last (possibly smaller) batch or not
+        batch_size : int
+            the number of samples per batch; only used if ``sampler`` is no
+            batch sampler
+        channels_last : bool
+            whether to move the channel axis (the second one) of all arrays
+            with at least four dimensions to the end after applying the
+            transforms (e.g. NCHW to NHWC)
 
         """
         super().__init__(data_loader=data_loader, sampler=sampler,
-                         transforms=transforms, seed=seed, drop_last=drop_last)
+                         transforms=transforms, seed=seed, drop_last=drop_last,
+                         batch_size=batch_size, channels_last=channels_last)
 
     def __iter__(self):
         # create sampler iterator
@@ -441,6 +928,9 @@ class _SequentialAugmenter(AbstractAugmenter):
             if self._transforms is not None:
                 data = self._transforms(**data)
 
+            if self._channels_last:
+                data = _to_channels_last(data)
+
             yield data
 
 
@@ -451,7 +941,14 @@ class Augmenter(object):
     debug mode
     """
     def __init__(self, data_loader, sampler, num_processes=None,
-                 transforms=None, seed=1, drop_last=False):
+                 transforms=None, seed=1, drop_last=False, batch_size=1,
+                 output_layout="NCHW",
+                 shared_memory_size=None,
+                 persistent_workers=False, arena_size=DEFAULT_ARENA_SIZE,
+                 prefetch_factor=2,
+                 coalesce_max_batches=1, coalesce_window_ms=0,
+                 pin_workers=False, cpu_set=None, pin_memory=False,
+                 return_tensors=False, prefetch=0):
         """
 
         Parameters
@@ -465,24 +962,122 @@ class Augmenter(object):
             the number of processes to use for dataloading + augmentation;
             if None: the number of available CPUs will be used as number of
             processes
-        transforms : :class:`collections.Callable`
+        transforms : :class:`collections.abc.Callable`
             the transforms to apply; defaults to None
         seed : int
             the basic seed; default: 1
         drop_last : bool
             whether to drop the last (possibly smaller) batch or not
+        batch_size : int
+            the number of samples per batch; only used if ``sampler`` is no
+            batch sampler
+        output_layout : str
+            the memory layout of the yielded arrays with at least four
+            dimensions; either 'NCHW' (channels first, as loaded and
+            transformed) or 'NHWC' (channels last); the layout is only
+            changed after applying the transforms
+        shared_memory_size : int
+            the size (in bytes) of each shared memory segment used to
+            transport batches from the workers; larger batches are sent
+            through pipes (e.g. :data:`DEFAULT_SHARED_MEMORY_SIZE`). If
+            None: shared memory transport is disabled. The segments occupy
+            ``shared_memory_size * (num_processes * prefetch_factor +
+            prefetch + 2)`` bytes of ``/dev/shm``, which must be large enough
+            (e.g. docker only provides 64 MB by default); otherwise the
+            workers are killed by SIGBUS; only used for parallel augmentation
+        persistent_workers : bool
+            whether to keep the worker processes alive between epochs; if
+            True, they are only shut down by :meth:`close`; only used for
+            parallel augmentation
+        arena_size : int
+            the size (in bytes) of each worker's arena, which the loaded
+            batches are allocated from; If None: batches are allocated
+            individually; only used for parallel augmentation
+        prefetch_factor : int
+            the number of batches enqueued to each worker in advance; bounds
+            the number of batches in flight (and thus the memory used for
+            them) to ``num_processes * prefetch_factor``; only used for
+            parallel augmentation
+        coalesce_max_batches : int
+            the maximum number of batches sent to a worker (and back) in a
+            single message, which reduces the number of messages for small
+            batches at the cost of latency; only used for parallel
+            augmentation
+        coalesce_window_ms : float
+            the maximum time (in milliseconds) to hold back batches, while
+            waiting for enough free slots to send ``coalesce_max_batches``
+            batches at once; if 0: batches are sent whenever a slot is free;
+            only used for parallel augmentation
+        pin_workers : bool
+            whether to pin each worker to a single CPU core (round robin over
+            ``cpu_set``), which avoids migrating the workers between cores;
+            only used for parallel augmentation
+        cpu_set : iterable
+            the CPU cores to pin the workers to; allows to keep the workers
+            away from the cores used for training. If None: all cores
+            available to the main process are used; only used for parallel
+            augmentation
+        pin_memory : bool
+            whether to copy the numeric arrays of each batch to pinned torch
+            tensors (see :meth:`PinnedBatch.pin_memory`) in the main process;
+            requires torch and a CUDA device
+        return_tensors : bool
+            whether to yield the numeric arrays of each batch as torch tensors
+            (see :meth:`PinnedBatch.as_tensors`), which share the memory of
+            the received arrays instead of copying them; requires torch.
+            Pinned batches always consist of tensors
+        prefetch : int
+            the number of batches a background thread of the main process
+            (which receives, restores and pins them) keeps ready for the
+            consumer; if 0: batches are only produced on request of the
+            consumer
+
+        Raises
+        ------
+        ValueError
+            if ``output_layout`` is neither 'NCHW' nor 'NHWC'
 
         """
 
+        if output_layout not in ("NCHW", "NHWC"):
+            raise ValueError("Invalid output layout: %s; must be one of "
+                             "'NCHW' and 'NHWC'" % str(output_layout))
+
+        parallel_kwargs = {"shared_memory_size": shared_memory_size,
+                           "persistent_workers": persistent_workers,
+                           "arena_size": arena_size,
+                           "prefetch_factor": prefetch_factor,
+                           "coalesce_max_batches": coalesce_max_batches,
+                           "coalesce_window_ms": coalesce_window_ms,
+                           "pin_workers": pin_workers,
+                           "cpu_set": cpu_set,
+                           "prefetch": prefetch}
+        kwargs = {"data_loader": data_loader, "sampler": sampler,
+                  "transforms": transforms, "seed": seed,
+                  "drop_last": drop_last, "batch_size": batch_size,
+                  "channels_last": output_layout == "NHWC"}
+
         self._augmenter = self._resolve_augmenter_cls(num_processes,
-                                                      data_loader=data_loader,
-                                                      sampler=sampler,
-                                                      transforms=transforms,
-                                                      seed=seed,
-                                                      drop_last=drop_last)
+                                                      parallel_kwargs,
+                                                      **kwargs)
+
+        # the iteration strategy is fixed after construction; binding it once
+        # avoids an additional generator frame per batch
+        self._iter_fn = self._augmenter.__iter__
+
+        if pin_memory:
+            self._iter_fn = functools.partial(self._pinned_iter,
+                                              self._iter_fn)
+        elif return_tensors:
+            self._iter_fn = functools.partial(self._tensor_iter,
+                                              self._iter_fn)
+
+        if prefetch > 0:
+            self._iter_fn = functools.partial(self._background_iter,
+                                              self._iter_fn, prefetch)
 
     @staticmethod
-    def _resolve_augmenter_cls(num_processes, **kwargs):
+    def _resolve_augmenter_cls(num_processes, parallel_kwargs, **kwargs):
         """
         Resolves the augmenter class by the number of specified processes and
         the debug mode and creates an instance of the chosen class
@@ -493,6 +1088,9 @@ class Augmenter(object):
             the number of processes to use for dataloading + augmentation;
             if None: the number of available CPUs will be used as number of
             processes
+        parallel_kwargs : dict
+            additional keyword arguments, which are only used for
+            instantiation of the :class:`_ParallelAugmenter`
         **kwargs :
             additional keyword arguments, used for instantiation of the chosen
             class
@@ -505,7 +1103,137 @@ class Augmenter(object):
         """
         if get_current_debug_mode() or num_processes == 0:
             return _SequentialAugmenter(**kwargs)
-        return _ParallelAugmenter(num_processes=num_processes, **kwargs)
+        return _ParallelAugmenter(num_processes=num_processes,
+                                  **parallel_kwargs, **kwargs)
+
+    def close(self):
+        """
+        Releases all resources held by the wrapped augmenter (e.g. shuts
+        down persistent worker processes)
+
+        """
+        self._augmenter.close()
+
+    @staticmethod
+    def _pinned_iter(iter_fn):
+        """
+        Pins the memory of all batches
+
+        Parameters
+        ----------
+        iter_fn : function
+            function returning the iterator over the unpinned batches
+
+        Returns
+        -------
+        Generator
+            a generator function yielding the pinned batches
+
+        """
+        for batch in iter_fn():
+            yield PinnedBatch(batch).pin_memory()
+
+    @staticmethod
+    def _tensor_iter(iter_fn):
+        """
+        Converts the arrays of all batches to torch tensors without copying
+        them
+
+        Parameters
+        ----------
+        iter_fn : function
+            function returning the iterator over the batches
+
+        Returns
+        -------
+        Generator
+            a generator function yielding the batches of tensors
+
+        """
+        for batch in iter_fn():
+            yield PinnedBatch(batch).as_tensors()
+
+    @staticmethod
+    def _background_iter(iter_fn, num_batches):
+        """
+        Produces the batches in a background thread, which keeps up to
+        ``num_batches`` batches ready
+
+        Parameters
+        ----------
+        iter_fn : function
+            function returning the iterator over the batches
+        num_batches : int
+            the maximum number of batches produced in advance
+
+        Returns
+        -------
+        Generator
+            a generator function yielding the batches
+
+        """
+        batch_queue = queue.Queue(maxsize=num_batches)
+        stop_event = threading.Event()
+
+        def produce():
+            batches = iter_fn()
+            try:
+                for batch in batches:
+                    batch_queue.put((batch, None))
+
+                    # consumer stopped early
+                    if stop_event.is_set():
+                        break
+
+            except Exception as e:
+                batch_queue.put((None, e))
+
+            finally:
+                # release the resources of the iterator (e.g. workers) in
+                # this thread, since it is running here; the end is always
+                # signalled (together with a failure while releasing), since
+                # the consumer would wait forever otherwise
+                close_error = None
+                try:
+                    batches.close()
+                except Exception as e:
+                    close_error = e
+                finally:
+                    batch_queue.put((_END_OF_BATCHES, close_error))
+
+        thread = threading.Thread(target=produce, daemon=True)
+        thread.start()
+
+        finished = False
+        try:
+            while True:
+                batch, error = batch_queue.get()
+                finished = batch is _END_OF_BATCHES
+
+                if error is not None:
+                    raise error
+
+                if finished:
+                    break
+
+                yield batch
+
+        finally:
+            stop_event.set()
+
+            # unblock the producer until it has released its resources;
+            # failures of batches which have not been requested are dropped
+            close_error = None
+            while not finished:
+                batch, close_error = batch_queue.get()
+                finished = batch is _END_OF_BATCHES
+
+            thread.join()
+
+            # report failures while releasing the resources after stopping
+            # early
+            if close_error is not None:
+                raise close_error
 
     def __iter__(self):
         """
@@ -516,4 +1244,4 @@ class Augmenter(object):
         Generator
             a generator function yielding the arguments
         """
-        yield from self._augmenter
+        return self._iter_fn()
@@ -0,0 +1,77 @@
+import numpy as np
+
+
+class BumpAllocator(object):
+    """
+    A simple arena allocator handing out consecutive (aligned) parts of a
+    single pre-allocated buffer as numpy arrays. Allocations cannot be freed
+    individually, but all of them are freed at once by :meth:`reset`, which
+    makes allocating and freeing the per-batch arrays almost free and keeps
+    re-using the same (already mapped) memory pages.
+
+    """
+
+    def __init__(self, capacity, alignment=64):
+        """
+
+        Parameters
+        ----------
+        capacity : int
+            the size of the arena in bytes
+        alignment : int
+            the alignment (in bytes) of each allocation
+
+        """
+        self._buffer = np.empty(int(capacity), dtype=np.uint8)
+        self._alignment = alignment
+        self._offset = 0
+
+    @property
+    def capacity(self):
+        """
+        Property to access the size of the arena
+
+        Returns
+        -------
+        int
+            the arena size in bytes
+
+        """
+        return self._buffer.nbytes
+
+    def allocate(self, shape, dtype):
+        """
+        Allocates an uninitialized array inside the arena
+
+        Parameters
+        ----------
+        shape : tuple
+            the shape of the array
+        dtype : str or :class:`numpy.dtype`
+            the datatype of the array
+
+        Returns
+        -------
+        :class:`numpy.ndarray` or None
+            the allocated array; None if the arena has not enough space left
+
+        """
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+
+        start = (self._offset + self._alignment - 1) // self._alignment \
+            * self._alignment
+
+        if start + nbytes > self.capacity:
+            return None
+
+        self._offset = start + nbytes
+        return np.ndarray(shape, dtype, buffer=self._buffer, offset=start)
+
+    def reset(self):
+        """
+        Frees all allocations at once; arrays allocated before must not be
+        used anymore afterwards
+
+        """
+        self._offset = 0
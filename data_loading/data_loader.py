@@ -1,6 +1,88 @@
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 from data_loading.dataset import AbstractDataset, DictDataset, IterableDataset
-from collections import Iterable
+from collections.abc import Iterable
+
+# dataset classes to wrap data of the most common (exact) types into
+_DATA_FACTORY = {dict: DictDataset, list: IterableDataset,
+                 tuple: IterableDataset}
+
+
+def _value_dtype(val):
+    """
+    Determines the datatype of a sample entry; python scalars get the
+    smallest datatype holding their value, so that e.g. small integer labels
+    can be stored in an int32 batch
+
+    Parameters
+    ----------
+    val : Any
+        the sample entry
+
+    Returns
+    -------
+    :class:`numpy.dtype`
+        the datatype of the entry
+
+    """
+    if isinstance(val, (np.ndarray, np.generic)):
+        return val.dtype
+
+    if isinstance(val, (bool, int, float, complex)):
+        return np.min_scalar_type(val)
+
+    return np.asarray(val).dtype
+
+
+class PinnedBatch(dict):
+    """
+    A batch (dict of arrays), which can be copied to page-locked (pinned)
+    memory. Pinned memory allows asynchronous transfers to the GPU, if the
+    tensors are moved with ``.to(device, non_blocking=True)`` afterwards
+
+    """
+
+    def pin_memory(self):
+        """
+        Replaces all numeric arrays of the batch by pinned torch tensors;
+        requires torch and a CUDA device
+
+        Returns
+        -------
+        :class:`PinnedBatch`
+            the batch itself
+
+        """
+        import torch
+
+        for key, val in self.items():
+            if isinstance(val, np.ndarray) and val.dtype.kind in "biufc":
+                self[key] = torch.as_tensor(val).pin_memory()
+
+        return self
+
+    def as_tensors(self):
+        """
+        Replaces all numeric arrays of the batch by torch tensors sharing
+        their memory (e.g. the shared memory segment the batch has been
+        transported in), i.e. without copying them; requires torch
+
+        Returns
+        -------
+        :class:`PinnedBatch`
+            the batch itself
+
+        """
+        import torch
+
+        for key, val in self.items():
+            if isinstance(val, np.ndarray) and val.dtype.kind in "biufc":
+                self[key] = torch.from_numpy(val)
+
+        return self
 
 
 class DataLoader:
@@ -8,7 +90,7 @@ class DataLoader:
     Basic Dataloader class, that returns data for a given set of indices and
     combines it as batches
     """
-    def __init__(self, data):
+    def __init__(self, data, io_concurrency=1, layout=None):
         """
 
         Parameters
@@ -17,23 +99,49 @@ class DataLoader:
             the data to use; Ideally this either is a dataset, an iterable or
             a dict, but in general, this must only be indexable, have a length
             and return a dict of arrays if indexed
+        io_concurrency : int
+            the number of threads loading the samples of a batch
+            concurrently; useful for datasets reading from disk (the dataset
+            must be thread-safe in this case). If 1: samples are loaded
+            sequentially without any threads
+        layout : dict
+            the known layout of every sample entry as tuple of
+            ``(shape, dtype)`` or None for non-numeric entries; if None: the
+            layout is learned from the first sample
 
         """
         self._process_id = None
+        self._io_concurrency = io_concurrency
+        # thread pool is created lazily, since it cannot be shared between
+        # processes
+        self._executor = None
+        self._executor_pid = None
+        # datatype and shape of every sample entry; learned from the first
+        # sample
+        self._layout_cache = {}
+        if layout is not None:
+            for key, entry_layout in layout.items():
+                if entry_layout is not None:
+                    shape, dtype = entry_layout
+                    entry_layout = (np.dtype(dtype), tuple(shape))
+                self._layout_cache[key] = entry_layout
+        # optional arena (:class:`BumpAllocator`) to allocate batches from
+        self.arena = None
 
-        # do nothing if data
-        if isinstance(data, AbstractDataset):
+        # wrap it into dataset depending on datatype; look up the most
+        # common types directly before the (slower) isinstance checks
+        factory = _DATA_FACTORY.get(type(data))
+        if factory is not None:
+            dataset = factory(data)
+        elif isinstance(data, AbstractDataset):
             dataset = data
-
+        elif isinstance(data, dict):
+            dataset = DictDataset(data)
+        elif isinstance(data, Iterable):
+            dataset = IterableDataset(data)
         else:
-            # wrap it into dataset depending on datatype
-            if isinstance(data, dict):
-                dataset = DictDataset(data)
-            elif isinstance(data, Iterable):
-                dataset = IterableDataset(data)
-            else:
-                raise TypeError("Invalid dataset type: %s"
-                                % type(data).__name__)
+            raise TypeError("Invalid dataset type: %s"
+                            % type(data).__name__)
 
         self.dataset = dataset
 
@@ -48,29 +156,144 @@ class DataLoader:
 
         Returns
         -------
-        dict
+        :class:`PinnedBatch`
             a dict of numpy arrays (specifying the batches)
 
         """
 
+        # let the dataset start reading all samples at once
+        self.dataset.prefetch(indices)
+
         # get data for all indices
-        data = [self.dataset[idx] for idx in indices]
+        if self._io_concurrency > 1:
+            samples = self._get_executor().map(self.dataset.__getitem__,
+                                               indices)
+        else:
+            samples = (self.dataset[idx] for idx in indices)
+
+        # learn the layout of the samples once from the very first sample
+        if not self._layout_cache:
+            first_sample = next(samples)
+            self._update_layout_cache(first_sample)
+            samples = itertools.chain([first_sample], samples)
+
+        # pre-allocate one contiguous array per key; non-numeric values
+        # (e.g. strings) are collected and converted at the end
+        data_dict, object_lists = PinnedBatch(), {}
+        for key, layout in self._layout_cache.items():
+            if layout is None:
+                object_lists[key] = []
+            else:
+                dtype, sample_shape = layout
+                data_dict[key] = self._allocate(
+                    (len(indices),) + sample_shape, dtype)
 
-        data_dict = {}
+        # (key, batch array, sample shape) for every array entry
+        array_entries = [(key, data_dict[key], self._layout_cache[key][1])
+                         for key in data_dict]
 
-        # concatenate dict entities by keys
-        for _result_dict in data:
-            for key, val in _result_dict.items():
-                if key in data_dict.keys():
-                    _result_dict[key].append(val)
-                else:
-                    _result_dict[key] = [val]
+        # fill the rows in place
+        for row, _sample in enumerate(samples):
+            if _sample.keys() != self._layout_cache.keys():
+                raise ValueError("Sample for index %s has keys %s, but "
+                                 "expected keys %s"
+                                 % (str(indices[row]), list(_sample.keys()),
+                                    list(self._layout_cache.keys())))
 
-        # convert list to numpy arrays
-        for key, val_list in data_dict.items():
+            for key, batch, sample_shape in array_entries:
+                val = _sample[key]
+                if np.shape(val) != sample_shape:
+                    raise ValueError("Shape mismatch for key %s: expected "
+                                     "%s, but got %s"
+                                     % (key, sample_shape, np.shape(val)))
+                # only safe casts are allowed, since others (including
+                # narrowing ones) would silently corrupt the values
+                val_dtype = _value_dtype(val)
+                if not np.can_cast(val_dtype, batch.dtype, casting="safe"):
+                    raise ValueError("Datatype mismatch for key %s: expected "
+                                     "%s, but got %s"
+                                     % (key, batch.dtype, val_dtype))
+
+                # copy into a view of the row (also for scalar entries)
+                np.copyto(batch[row, ...], val, casting="unsafe")
+
+            for key, val_list in object_lists.items():
+                val_list.append(_sample[key])
+
+        # convert collected non-numeric values to numpy arrays
+        for key, val_list in object_lists.items():
             data_dict[key] = np.asarray(val_list)
 
-        return
+        return data_dict
+
+    def _get_executor(self):
+        """
+        Returns the thread pool to load samples concurrently and (re-)creates
+        it if necessary (e.g. after forking into a worker process)
+
+        Returns
+        -------
+        :class:`concurrent.futures.ThreadPoolExecutor`
+            the thread pool of the current process
+
+        """
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._io_concurrency)
+            self._executor_pid = os.getpid()
+
+        return self._executor
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # thread pools cannot be pickled
+        state["_executor"] = None
+        state["_executor_pid"] = None
+        return state
+
+    def _update_layout_cache(self, sample):
+        """
+        Caches datatype and shape of each entry of a sample, which are then
+        assumed to be the same for all samples of the dataset
+
+        Parameters
+        ----------
+        sample : dict
+            the sample to learn the layout from
+
+        """
+        for key, val in sample.items():
+            val = np.asarray(val)
+            if val.dtype.kind in "OSUV":
+                # no fixed layout for non-numeric values
+                self._layout_cache[key] = None
+            else:
+                self._layout_cache[key] = (val.dtype, val.shape)
+
+    def _allocate(self, shape, dtype):
+        """
+        Allocates an uninitialized array from the arena if available and
+        large enough and falls back to :func:`numpy.empty` otherwise
+
+        Parameters
+        ----------
+        shape : tuple
+            the shape of the array
+        dtype : str or :class:`numpy.dtype`
+            the datatype of the array
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            the allocated array
+
+        """
+        if self.arena is not None:
+            arr = self.arena.allocate(shape, dtype)
+            if arr is not None:
+                return arr
+
+        return np.empty(shape, dtype=dtype)
 
     @property
     def process_id(self):
@@ -1,20 +1,95 @@
-import inspect
 import logging
+from collections import namedtuple
 
-from batchgenerators.transforms import AbstractTransform
-
-from multiprocessing import Queue
+from batchgenerators.transforms import AbstractTransform, Compose
 
 from delira import get_current_debug_mode
-from data_loading.data_loader import DataLoader
+from data_loading.data_loader import DataLoader, _DATA_FACTORY
 from data_loading.sampler import SequentialSampler, AbstractSampler
 from data_loading.augmenter import Augmenter
 from data_loading.dataset import DictDataset, IterableDataset, AbstractDataset
-from collections import Iterable
+from collections.abc import Iterable
 
 logger = logging.getLogger(__name__)
 
 
+def _is_subclass(obj, base):
+    """
+    Checks whether an object is a class and a subclass of a given base class
+
+    Parameters
+    ----------
+    obj : Any
+        the object to check
+    base : type
+        the base class
+
+    Returns
+    -------
+    bool
+        whether ``obj`` is a subclass of ``base``
+
+    """
+    return isinstance(obj, type) and issubclass(obj, base)
+
+
+def _flatten_transforms(transforms):
+    """
+    Recursively flattens (possibly nested) compositions of transforms
+
+    Parameters
+    ----------
+    transforms : ``AbstractTransform``
+        the transform to flatten
+
+    Returns
+    -------
+    list
+        the sequence of all transforms, which are not compositions
+
+    """
+    # only flatten compositions applying their transforms sequentially
+    if isinstance(transforms, Compose) and \
+            type(transforms).__call__ is Compose.__call__:
+        return [_transform for _sub_transforms in transforms.transforms
+                for _transform in _flatten_transforms(_sub_transforms)]
+
+    return [transforms]
+
+
+class _FusedTransforms(object):
+    """
+    Applies a flat sequence of transforms in a single loop, which replaces
+    the nested dispatch through (possibly nested) compositions
+
+    """
+
+    def __init__(self, transforms):
+        """
+
+        Parameters
+        ----------
+        transforms : list
+            the sequence of transforms to apply
+
+        """
+        self.transforms = tuple(transforms)
+
+    def __call__(self, **data_dict):
+        for _transform in self.transforms:
+            data_dict = _transform(**data_dict)
+        return data_dict
+
+
+# immutable snapshot of a manager's configuration, from which an augmenter is
+# created; the fields match the augmenter's keyword arguments
+_DMConfig = namedtuple("_DMConfig", ["sampler", "num_processes", "transforms",
+                                     "seed", "drop_last", "batch_size",
+                                     "pin_memory", "return_tensors",
+                                     "prefetch", "output_layout",
+                                     "persistent_workers"])
+
+
 class DataManager(object):
     """
     Class to Handle Data
@@ -22,10 +97,21 @@ class DataManager(object):
 
     """
 
+    # managers are often created per fold; avoid a per-instance dict
+    __slots__ = ("_batch_size", "_n_process_augmentation",
+                 "_effective_n_processes", "_transforms",
+                 "_fused_transforms", "_data_loader_cls",
+                 "_sampler", "_sampler_kwargs", "_drop_last", "_n_samples",
+                 "_n_batches", "pin_memory", "return_tensors", "prefetch",
+                 "fixed_batch_shape", "output_layout", "persistent_workers",
+                 "io_concurrency", "data")
+
     def __init__(self, data, batch_size, n_process_augmentation,
                  transforms, sampler_cls=SequentialSampler,
-                 drop_last=False, data_loader_cls=None,
-                 **sampler_kwargs):
+                 drop_last=False, data_loader_cls=None, pin_memory=False,
+                 prefetch=0, fixed_batch_shape=None, output_layout="NCHW",
+                 return_tensors=False, persistent_workers=False,
+                 io_concurrency=1, **sampler_kwargs):
         """
 
         Parameters
@@ -45,6 +131,34 @@ class DataManager(object):
             whether to drop the last (possibly smaller) batch
         data_loader_cls : subclass of SlimDataLoaderBase
             DataLoader class
+        pin_memory : bool
+            whether to copy the batches to pinned torch tensors, which allows
+            asynchronous GPU transfers with ``.to(device, non_blocking=True)``;
+            requires torch and a CUDA device
+        prefetch : int
+            the number of batches a background thread keeps ready for the
+            consumer; if 0: batches are only produced on request
+        fixed_batch_shape : dict
+            the known shape and datatype (as tuple of ``(shape, dtype)``,
+            excluding the batch dimension) of each sample entry or None for
+            non-numeric entries; all samples are validated against it. If
+            None: it is determined from the first sample
+        output_layout : str
+            the memory layout of the yielded arrays with at least four
+            dimensions; either 'NCHW' (channels first) or 'NHWC' (channels
+            last); the layout is only changed after applying the transforms
+        return_tensors : bool
+            whether to yield torch tensors sharing the memory of the received
+            batches instead of numpy arrays; requires torch. Pinned batches
+            always consist of tensors
+        persistent_workers : bool
+            whether the augmentation processes of a batchgenerator are kept
+            alive between its epochs instead of being restarted for each
+            epoch; they are shut down by its ``close`` method
+        io_concurrency : int
+            the number of threads loading the samples of a batch
+            concurrently (see :class:`DataLoader`); if 1: samples are loaded
+            sequentially
         **sampler_kwargs :
             other keyword arguments (passed to sampler_cls)
 
@@ -67,10 +181,23 @@ class DataManager(object):
             sampler_kwargs = {}
         self._batch_size = None
         self._n_process_augmentation = None
+        self._effective_n_processes = None
         self._transforms = None
+        self._fused_transforms = None
         self._data_loader_cls = None
         self._sampler = None
+        self._drop_last = None
+        # cached numbers of samples and batches; None if invalidated
+        self._n_samples = None
+        self._n_batches = None
         self.drop_last = drop_last
+        self.pin_memory = pin_memory
+        self.prefetch = prefetch
+        self.fixed_batch_shape = fixed_batch_shape
+        self.output_layout = output_layout
+        self.return_tensors = return_tensors
+        self.persistent_workers = persistent_workers
+        self.io_concurrency = io_concurrency
 
         # set actual values to properties
         self.batch_size = batch_size
@@ -82,14 +209,19 @@ class DataManager(object):
             logger.info("No dataloader Class specified. Using DataLoader")
             data_loader_cls = DataLoader
         else:
-            assert inspect.isclass(data_loader_cls), \
+            assert isinstance(data_loader_cls, type), \
                 "data_loader_cls must be class not instance of class"
             assert issubclass(data_loader_cls, DataLoader), \
                 "dater_loader_cls must be subclass of DataLoader"
 
         self.data_loader_cls = data_loader_cls
 
-        if not isinstance(data, AbstractDataset):
+        # look up the most common types directly before the (slower)
+        # isinstance checks
+        factory = _DATA_FACTORY.get(type(data))
+        if factory is not None:
+            data = factory(data)
+        elif not isinstance(data, AbstractDataset):
             if isinstance(data, dict):
                 data = DictDataset(data)
             elif isinstance(data, Iterable):
@@ -100,10 +232,41 @@ class DataManager(object):
 
         self.data = data
 
-        assert inspect.isclass(sampler_cls) and issubclass(sampler_cls,
-                                                           AbstractSampler)
+        assert _is_subclass(sampler_cls, AbstractSampler)
+        # kept to create samplers of the same kind for subsets
+        self._sampler_kwargs = sampler_kwargs
         self.sampler = sampler_cls.from_dataset(self.data, **sampler_kwargs)
 
+    def _snapshot_config(self, seed):
+        """
+        Evaluates all properties the augmenter depends on once (including the
+        debug mode check, see :meth:`refresh_debug_mode`)
+
+        Parameters
+        ----------
+        seed : int
+            seed for Random Number Generator
+
+        Returns
+        -------
+        :class:`_DMConfig`
+            the snapshot of the current configuration
+
+        """
+        self.refresh_debug_mode()
+
+        return _DMConfig(sampler=self._sampler,
+                         num_processes=self.n_process_augmentation,
+                         transforms=self._fused_transforms,
+                         seed=seed,
+                         drop_last=self._drop_last,
+                         batch_size=self._batch_size,
+                         pin_memory=self.pin_memory,
+                         return_tensors=self.return_tensors,
+                         prefetch=self.prefetch,
+                         output_layout=self.output_layout,
+                         persistent_workers=self.persistent_workers)
+
     def get_batchgen(self, seed=1):
         """
         Create DataLoader and Batchgenerator
@@ -126,22 +289,21 @@ class DataManager(object):
         """
         assert self.n_batches > 0
 
-        sampler_queues = []
+        config = self._snapshot_config(seed)
 
-        for idx in range(self.n_process_augmentation):
-            sampler_queues.append(Queue())
+        # only pass non-default options, since custom data loaders might
+        # not accept them
+        data_loader_kwargs = {}
+        if self.fixed_batch_shape is not None:
+            data_loader_kwargs["layout"] = self.fixed_batch_shape
+        if self.io_concurrency != 1:
+            data_loader_kwargs["io_concurrency"] = self.io_concurrency
 
         data_loader = self.data_loader_cls(
-            self.data
+            self.data, **data_loader_kwargs
         )
 
-        return Augmenter(data_loader=data_loader,
-                         sampler=self.sampler,
-                         num_processes=self.n_process_augmentation,
-                         transforms=self.transforms,
-                         seed=seed,
-                         drop_last=self.drop_last
-                         )
+        return Augmenter(data_loader=data_loader, **config._asdict())
 
     def get_subset(self, indices):
         """
@@ -161,15 +323,23 @@ class DataManager(object):
 
         subset_kwargs = {
             "batch_size": self.batch_size,
-            "n_process_augmentation": self.n_process_augmentation,
+            "n_process_augmentation": self._n_process_augmentation,
             "transforms": self.transforms,
             "sampler_cls": self.sampler.__class__,
+            "drop_last": self.drop_last,
             "data_loader_cls": self.data_loader_cls,
+            "pin_memory": self.pin_memory,
+            "prefetch": self.prefetch,
+            "fixed_batch_shape": self.fixed_batch_shape,
+            "output_layout": self.output_layout,
+            "return_tensors": self.return_tensors,
+            "persistent_workers": self.persistent_workers,
+            "io_concurrency": self.io_concurrency,
         }
 
         return self.__class__(
-            self.data.get_subset(indices),
-            **subset_kwargs)
+            self.data.get_subset(indices), **subset_kwargs,
+            **self.sampler.get_subset_kwargs(indices, **self._sampler_kwargs))
 
     def update_state_from_dict(self, new_state: dict):
         """
@@ -203,16 +373,17 @@ class DataManager(object):
         self.batch_size = new_state.pop("batch_size", self.batch_size)
         # update n_process_augmentation if specified
         self.n_process_augmentation = new_state.pop(
-            "n_process_augmentation", self.n_process_augmentation)
+            "n_process_augmentation", self._n_process_augmentation)
         # update data_loader_cls if specified
         self.data_loader_cls = new_state.pop("data_loader_cls",
                                              self.data_loader_cls)
         # update
         new_sampler = new_state.pop("sampler", None)
         if new_sampler is not None:
+            self._sampler_kwargs = new_state.pop("sampling_kwargs", {})
             self.sampler = new_sampler.from_dataset(
                 self.data,
-                **new_state.pop("sampling_kwargs", {}))
+                **self._sampler_kwargs)
         self.transforms = new_state.pop("transforms", self.transforms)
 
         if new_state:
@@ -246,21 +417,50 @@ class DataManager(object):
         """
 
         self._batch_size = int(new_batch_size)
+        self._n_batches = None
+
+    @property
+    def drop_last(self):
+        """
+        Property to access whether the last (possibly smaller) batch is
+        dropped
+
+        Returns
+        -------
+        bool
+            whether the last batch is dropped
+        """
+
+        return self._drop_last
+
+    @drop_last.setter
+    def drop_last(self, new_drop_last):
+        """
+        Setter for whether the last (possibly smaller) batch is dropped
+
+        Parameters
+        ----------
+        new_drop_last : bool
+            whether to drop the last batch
+
+        """
+
+        self._drop_last = bool(new_drop_last)
+        self._n_batches = None
 
     @property
     def n_process_augmentation(self):
         """
-        Property to access the number of augmentation processes
+        Property to access the number of augmentation processes; the debug
+        mode is only checked when setting it or by :meth:`refresh_debug_mode`
 
         Returns
         -------
         int
-            number of augmentation processes
+            number of augmentation processes (1 in debug mode)
         """
 
-        if get_current_debug_mode():
-            return 1
-        return self._n_process_augmentation
+        return self._effective_n_processes
 
     @n_process_augmentation.setter
     def n_process_augmentation(self, new_process_number):
@@ -278,6 +478,19 @@ class DataManager(object):
         """
 
         self._n_process_augmentation = int(new_process_number)
+        self.refresh_debug_mode()
+
+    def refresh_debug_mode(self):
+        """
+        Re-evaluates the debug mode, which limits the effective number of
+        augmentation processes to 1; called for every new batchgenerator
+
+        """
+
+        if get_current_debug_mode():
+            self._effective_n_processes = 1
+        else:
+            self._effective_n_processes = self._n_process_augmentation
 
     @property
     def transforms(self):
@@ -311,6 +524,13 @@ class DataManager(object):
 
         self._transforms = new_transforms
 
+        # the augmenter applies the flattened compositions
+        if isinstance(new_transforms, Compose):
+            self._fused_transforms = _FusedTransforms(
+                _flatten_transforms(new_transforms))
+        else:
+            self._fused_transforms = new_transforms
+
     @property
     def data_loader_cls(self):
         """
@@ -337,8 +557,7 @@ class DataManager(object):
 
         """
 
-        assert inspect.isclass(new_loader_cls) and issubclass(
-            new_loader_cls, DataLoader)
+        assert _is_subclass(new_loader_cls, DataLoader)
 
         self._data_loader_cls = new_loader_cls
 
@@ -375,8 +594,7 @@ class DataManager(object):
 
         """
 
-        if inspect.isclass(new_sampler) and issubclass(new_sampler,
-                                                       AbstractSampler):
+        if _is_subclass(new_sampler, AbstractSampler):
             self._sampler = new_sampler.from_dataset(self.data)
 
         elif isinstance(new_sampler, AbstractSampler):
@@ -386,10 +604,13 @@ class DataManager(object):
             raise ValueError("Given Sampler is neither a subclass of \
                             AbstractSampler, nor an instance of a sampler ")
 
+        self._n_samples = len(self._sampler)
+        self._n_batches = None
+
     @property
     def n_samples(self):
         """
-        Number of Samples
+        Number of Samples; cached whenever the sampler is set
 
         Returns
         -------
@@ -397,30 +618,26 @@ class DataManager(object):
             Number of Samples
 
         """
-        return len(self.sampler)
+        return self._n_samples
 
     @property
     def n_batches(self):
         """
-        Returns Number of Batches based on batchsize and number of samples
+        Returns Number of Batches based on batchsize and number of samples;
+        cached until the sampler, the batchsize or :attr:`drop_last` change
 
         Returns
         -------
         int
             Number of Batches
 
-        Raises
-        ------
-        AssertionError
-            :attr:`BaseDataManager.n_samples` is smaller than or equal to zero
-
         """
-        assert self.n_samples > 0
-
-        n_batches = self.n_samples // self.batch_size
+        if self._n_batches is None:
+            n_batches, truncated_batch = divmod(self._n_samples,
+                                                self._batch_size)
 
-        truncated_batch = self.n_samples % self.batch_size
+            n_batches += int(bool(truncated_batch) and not self._drop_last)
 
-        n_batches += int(bool(truncated_batch) and not self.drop_last)
+            self._n_batches = n_batches
 
-        return n_batches
+        return self._n_batches
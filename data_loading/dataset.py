@@ -5,9 +5,11 @@ import typing
 import numpy as np
 from skimage.transform import resize
 from sklearn.model_selection import train_test_split
-from collections import Iterable
+from collections.abc import Iterable
 from tqdm import tqdm
 
+from data_loading.readahead import iter_sample_files, advise_willneed, \
+    FileTable
 from delira import get_backends
 from delira.utils import subdirs
 from delira.utils.decorators import make_deprecated
@@ -119,6 +121,20 @@ class AbstractDataset:
 
         return self.data[index]
 
+    def prefetch(self, indices):
+        """
+        Hints the dataset, that the samples for the given indices are going
+        to be loaded soon, e.g. to start reading all of them at once.
+        Does nothing by default and can be overwritten by lazy datasets
+
+        Parameters
+        ----------
+        indices : list
+            the indices of the samples to be loaded
+
+        """
+        pass
+
     def get_subset(self, indices):
         """
         Returns a Subset of the current dataset based on given indices
@@ -146,6 +162,7 @@ class AbstractDataset:
                 kwargs[key] = val
 
         kwargs["old_getitem"] = self.__class__.__getitem__
+        kwargs["old_prefetch"] = self.__class__.prefetch
         subset_data = [self.get_sample_from_index(idx) for idx in indices]
 
         return BlankDataset(subset_data, **kwargs)
@@ -249,7 +266,7 @@ class BlankDataset(AbstractDataset):
 
     """
 
-    def __init__(self, data, old_getitem, **kwargs):
+    def __init__(self, data, old_getitem, old_prefetch=None, **kwargs):
         """
 
         Parameters
@@ -258,6 +275,9 @@ class BlankDataset(AbstractDataset):
             data to load
         old_getitem : function
             get item method of previous dataset
+        old_prefetch : function
+            prefetch method of previous dataset; if None: nothing is
+            prefetched
         **kwargs :
             additional keyword arguments (are set as class attribute)
 
@@ -266,6 +286,7 @@ class BlankDataset(AbstractDataset):
 
         self.data = data
         self._old_getitem = old_getitem
+        self._old_prefetch = old_prefetch
 
         for key, val in kwargs.items():
             setattr(self, key, val)
@@ -287,6 +308,20 @@ class BlankDataset(AbstractDataset):
         """
         return self._old_getitem(self, index)
 
+    def prefetch(self, indices):
+        """
+        hints the dataset, that the samples for the given indices are going
+        to be loaded soon via the ``prefetch`` method of the previous dataset
+
+        Parameters
+        ----------
+        indices : list
+            the indices of the samples to be loaded
+
+        """
+        if self._old_prefetch is not None:
+            self._old_prefetch(self, indices)
+
     def __len__(self):
         """
         returns the length of the dataset
@@ -396,7 +431,7 @@ class BaseLazyDataset(AbstractDataset):
     """
 
     def __init__(self, data_path: typing.Union[str, list],
-                 load_fn: typing.Callable, **load_kwargs):
+                 load_fn: typing.Callable, readahead=False, **load_kwargs):
         """
 
         Parameters
@@ -408,6 +443,10 @@ class BaseLazyDataset(AbstractDataset):
             list
         load_fn : function
             function to load single data sample
+        readahead : bool
+            whether to let the kernel read all files of a batch into the page
+            cache at once before loading them (see :meth:`prefetch`); only
+            useful if the load function reads the whole files
         **load_kwargs :
             additional loading keyword arguments (image shape,
             channel number, ...); passed to _sample_fn
@@ -415,6 +454,10 @@ class BaseLazyDataset(AbstractDataset):
         """
         super().__init__(data_path, load_fn)
         self._load_kwargs = load_kwargs
+        self._readahead = readahead
+        # files kept open for readahead during the process' lifetime; only
+        # needed if readahead is enabled
+        self._file_table = FileTable() if readahead else None
         self.data = self._make_dataset(self.data_path)
 
     def _make_dataset(self, path: typing.Union[str, list]):
@@ -465,6 +508,41 @@ class BaseLazyDataset(AbstractDataset):
                                   **self._load_kwargs)
         return data_dict
 
+    def open_files(self):
+        """
+        Opens the files of all samples in advance (as far as the capacity of
+        the dataset's file table permits), which should be done before
+        starting worker processes: the workers then re-use these files
+        instead of opening them on their own. Does nothing if readahead is
+        disabled
+
+        """
+        if self._file_table is None:
+            return
+
+        self._file_table.open(file for idx in range(len(self))
+                              for file in iter_sample_files(
+                                  self.get_sample_from_index(idx)))
+
+    def prefetch(self, indices):
+        """
+        Starts reading the files of all samples for the given indices into
+        the page cache in the background, if readahead is enabled
+
+        Parameters
+        ----------
+        indices : list
+            the indices of the samples to be loaded
+
+        """
+        if not self._readahead:
+            return
+
+        advise_willneed((file for idx in indices
+                         for file in iter_sample_files(
+                             self.get_sample_from_index(idx))),
+                        self._file_table)
+
 
 class BaseExtendCacheDataset(BaseCacheDataset):
     """
@@ -1,14 +1,213 @@
-import json
+import hashlib
 import logging
 import os
+import tempfile
+import threading
 from abc import abstractmethod
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import SimpleITK as sitk
 
 from delira.utils.decorators import make_deprecated
 
+# nibabel is optional; it allows to memory-map uncompressed nii files
+try:
+    import nibabel as nib
+except ImportError:
+    nib = None
+
+# orjson is optional; it parses json files considerably faster
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
 logger = logging.getLogger(__name__)
 
+# maximum number of bytes of decoded volumes (which cannot be memory-mapped)
+# cached per process; the cache is disabled if 0
+NII_CACHE_BYTES = 0
+
+
+def _is_mappable(path):
+    """
+    Checks whether a nii file can be memory-mapped
+
+    Parameters
+    ----------
+    path: str
+        path to nii file
+
+    Returns
+    -------
+    bool
+        whether nibabel is available and the file is uncompressed
+
+    """
+    return nib is not None and path.endswith(".nii")
+
+
+def _map_nii(path, z_slice=slice(None)):
+    """
+    Memory-maps an uncompressed nii file with nibabel; data is only read once
+    it is accessed and the page cache is re-used across epochs
+
+    Parameters
+    ----------
+    path: str
+        path to nii file
+    z_slice: int or slice
+        the index or slice along the last axis (in nibabel's axis order);
+        only this part is read
+
+    Returns
+    -------
+    np.ndarray
+        the image data (in nibabel's axis order and native byte order);
+        scaled data is returned as float32 (as done by SimpleITK) instead of
+        nibabel's float64
+
+    """
+    proxy = nib.load(path, mmap=True).dataobj
+    data = proxy.get_unscaled()[..., z_slice]
+
+    if proxy.slope != 1 or proxy.inter != 0:
+        data = np.multiply(data, proxy.slope, dtype=np.float32)
+        data += np.float32(proxy.inter)
+    else:
+        # SimpleITK always returns native byte order; non-native files are
+        # therefore copied instead of being memory-mapped
+        data = data.astype(data.dtype.newbyteorder("="), copy=False)
+
+    return data
+
+
+class _NiiCache(object):
+    """
+    A cache of decoded nii files, which is bounded by the number of bytes of
+    the decoded volumes (see :data:`NII_CACHE_BYTES`); the least recently used
+    volumes are evicted first
+
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        # the cache is shared by the threads of :func:`load_nii_prefetch`
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns a cached entry and marks it as recently used
+
+        Parameters
+        ----------
+        key : tuple
+            the key of the entry
+
+        Returns
+        -------
+        tuple or None
+            the cached entry or None if it is not cached
+
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        """
+        Caches an entry if it fits into the cache and evicts the least
+        recently used entries afterwards
+
+        Parameters
+        ----------
+        key : tuple
+            the key of the entry
+        entry : tuple
+            the image and the array view onto it
+
+        """
+        nbytes = entry[1].nbytes
+        if nbytes > NII_CACHE_BYTES:
+            return
+
+        with self._lock:
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self._nbytes -= old_entry[1].nbytes
+
+            self._entries[key] = entry
+            self._nbytes += nbytes
+
+            while self._nbytes > NII_CACHE_BYTES:
+                _, (_, view) = self._entries.popitem(last=False)
+                self._nbytes -= view.nbytes
+
+
+_nii_cache = _NiiCache()
+
+
+def _read_nii(path):
+    """
+    Reads and decodes a nii file with SimpleITK, since compressed files cannot
+    be memory-mapped; the result is cached if enabled (see
+    :data:`NII_CACHE_BYTES`). Cached files are re-read once they have been
+    modified
+
+    Parameters
+    ----------
+    path: str
+        path to nii file
+
+    Returns
+    -------
+    :class:`SimpleITK.Image`
+        the image; must be kept alive as long as its array view is used
+    np.ndarray
+        read-only view onto the image's buffer (without copying it)
+
+    """
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+
+    entry = _nii_cache.get(key)
+    if entry is None:
+        image = sitk.ReadImage(path)
+        entry = (image, sitk.GetArrayViewFromImage(image))
+        _nii_cache.put(key, entry)
+
+    return entry
+
+
+def _nii_array(path):
+    """
+    Returns the data of a nii file without copying it: either memory-mapped
+    or as view onto the decoded image
+
+    Parameters
+    ----------
+    path: str
+        path to nii file
+
+    Returns
+    -------
+    Any
+        the owner of the data, which must be kept alive as long as the data
+        is used
+    np.ndarray
+        the data (in SimpleITK's axis order); must not be modified
+
+    """
+    if _is_mappable(path):
+        return None, _map_nii(path).T
+
+    return _read_nii(path)
+
 
 def load_nii(path):
     """
@@ -21,9 +220,192 @@ def load_nii(path):
     Returns
     -------
     np.ndarray
-        numpy array containing the loaded data
+        numpy array containing the loaded data (in SimpleITK's axis order)
+    """
+    if _is_mappable(path):
+        return _map_nii(path).T
+
+    image, data = _read_nii(path)
+    return data.copy()
+
+
+def load_nii_into(path, out):
+    """
+    Loads a single nii file directly into a pre-allocated array (e.g. a row
+    of a batch), which avoids allocating an intermediate array for it
+
+    Parameters
+    ----------
+    path: str
+        path to nii file which should be loaded
+    out: np.ndarray
+        the array to write the data to; must have the shape of the data (in
+        SimpleITK's axis order), the data is cast to its datatype
+
+    Returns
+    -------
+    np.ndarray
+        the array containing the loaded data
+    """
+    owner, data = _nii_array(path)
+    np.copyto(out, data, casting="unsafe")
+    return out
+
+
+def load_nii_slice(path, z_slice):
+    """
+    Loads a part of a nii file along the first axis (of the array returned
+    by :func:`load_nii`); for memory-mapped files only this part is read
+
+    Parameters
+    ----------
+    path: str
+        path to nii file which should be loaded
+    z_slice: int or slice
+        the index or slice along the first axis
+
+    Returns
+    -------
+    np.ndarray
+        numpy array containing the loaded data (in SimpleITK's axis order)
     """
-    return sitk.GetArrayFromImage(sitk.ReadImage(path))
+    if _is_mappable(path):
+        return np.asarray(_map_nii(path, z_slice)).T
+
+    image, data = _read_nii(path)
+    return data[z_slice].copy()
+
+
+def _default_cache_dir():
+    """
+    Returns the default directory for converted nii files, which is located
+    in the user's cache directory (``$XDG_CACHE_HOME`` or ``~/.cache``)
+
+    Returns
+    -------
+    str
+        the default cache directory
+
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or \
+        os.path.join(os.path.expanduser("~"), ".cache")
+
+    return os.path.join(cache_home, "data_loading", "nii")
+
+
+def _nii_cache_path(path, cache_dir):
+    """
+    Computes the path of the converted copy of a nii file; the name depends
+    on the absolute path, size and modification time of the file, so that
+    modified files are converted again
+
+    Parameters
+    ----------
+    path: str
+        path to nii file
+    cache_dir: str
+        directory containing the converted files
+
+    Returns
+    -------
+    str
+        path of the converted file
+
+    """
+    stat = os.stat(path)
+    key = "%s:%d:%d" % (os.path.abspath(path), stat.st_size,
+                        stat.st_mtime_ns)
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+    return os.path.join(cache_dir, "%s.%s.npy" % (os.path.basename(path),
+                                                  digest))
+
+
+def load_nii_cached(path, cache_dir=None):
+    """
+    Loads a single nii file from an uncompressed .npy copy, which is created
+    on the first call. The copy is memory-mapped afterwards, so decoding the
+    file is skipped entirely and all processes share the same pages of the
+    page cache
+
+    Parameters
+    ----------
+    path: str
+        path to nii file which should be loaded
+    cache_dir: str
+        directory to store the converted files in; if None: they are stored
+        in the user's cache directory (``$XDG_CACHE_HOME/data_loading/nii``
+        or ``~/.cache/data_loading/nii``)
+
+    Returns
+    -------
+    np.ndarray
+        memory-mapped array containing the loaded data (in SimpleITK's axis
+        order); modifications are not written back to the file
+    """
+    if cache_dir is None:
+        cache_dir = _default_cache_dir()
+
+    cache_path = _nii_cache_path(path, cache_dir)
+
+    if not os.path.isfile(cache_path):
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # write to a temporary file first, so that concurrent processes never
+        # map a partially written file
+        fd, tmp_path = tempfile.mkstemp(suffix=".npy", dir=cache_dir)
+        try:
+            # the file takes ownership of the descriptor, which is thus
+            # closed even if loading the data fails
+            with os.fdopen(fd, "wb") as f:
+                owner, data = _nii_array(path)
+                np.save(f, data)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    return np.load(cache_path, mmap_mode="c")
+
+
+def load_nii_prefetch(paths, max_workers=4, queue_depth=8):
+    """
+    Loads multiple nii files (in order) with a pool of background threads,
+    which already read and decode the next files while the current one is
+    processed
+
+    Parameters
+    ----------
+    paths: iterable
+        paths to the nii files which should be loaded
+    max_workers: int
+        the number of threads loading files concurrently
+    queue_depth: int
+        the maximum number of files loaded in advance
+
+    Yields
+    ------
+    np.ndarray
+        numpy array containing the loaded data of each file (see
+        :func:`load_nii`)
+    """
+    futures = deque()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            for path in paths:
+                futures.append(executor.submit(load_nii, path))
+
+                if len(futures) >= queue_depth:
+                    yield futures.popleft().result()
+
+            while futures:
+                yield futures.popleft().result()
+
+        finally:
+            # do not load files, which will not be consumed anymore
+            for future in futures:
+                future.cancel()
 
 
 class BaseLabelGenerator(object):
@@ -63,8 +445,8 @@ class BaseLabelGenerator(object):
             loaded values from file
 
         """
-        with open(os.path.join(self.fpath), 'r') as f:
-            label = json.load(f)
+        with open(self.fpath, 'rb') as f:
+            label = _json_loads(f.read())
         return label
 
     @abstractmethod
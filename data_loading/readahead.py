@@ -0,0 +1,207 @@
+import os
+from collections import OrderedDict
+from multiprocessing import context, reduction
+
+# default maximum number of file descriptors kept open by a FileTable; kept
+# small, since every (lazy) dataset holds its own table in every process
+DEFAULT_MAX_OPEN_FILES = 32
+
+
+def iter_sample_files(sample):
+    """
+    Yields all files referenced by a (not yet loaded) sample of a lazy
+    dataset
+
+    Parameters
+    ----------
+    sample : str, list, tuple or dict
+        the sample; strings are treated as paths (directories are expanded to
+        the files directly inside them), lists, tuples and dicts are searched
+        recursively
+
+    Yields
+    ------
+    str
+        the path of each file
+
+    """
+    if isinstance(sample, str):
+        if os.path.isdir(sample):
+            for entry in os.scandir(sample):
+                if entry.is_file():
+                    yield entry.path
+        else:
+            yield sample
+
+    elif isinstance(sample, dict):
+        for val in sample.values():
+            yield from iter_sample_files(val)
+
+    elif isinstance(sample, (list, tuple)):
+        for val in sample:
+            yield from iter_sample_files(val)
+
+
+class FileTable(object):
+    """
+    A bounded table of read-only file descriptors. Each file is opened once
+    and kept open afterwards, so that repeated accesses (e.g. in every epoch)
+    do not open and close it again; if the table is full, the least recently
+    used file is closed.
+
+    Tables are shared with child processes: forked children inherit all open
+    files and when pickled for starting a child process (e.g. with the
+    ``spawn`` start method), the file descriptors are passed to the child
+    instead of re-opening the files there. Otherwise an empty table with the
+    same capacity is restored when unpickling.
+
+    """
+
+    def __init__(self, max_open=DEFAULT_MAX_OPEN_FILES):
+        """
+
+        Parameters
+        ----------
+        max_open : int
+            the maximum number of files kept open at once
+
+        """
+        self._max_open = max_open
+        self._fds = OrderedDict()
+
+    def get(self, path):
+        """
+        Returns the file descriptor of a file and opens it if necessary
+
+        Parameters
+        ----------
+        path : str
+            the path of the file
+
+        Returns
+        -------
+        int
+            the file descriptor
+
+        Raises
+        ------
+        OSError
+            if the file cannot be opened
+
+        """
+        fd = self._fds.get(path)
+
+        if fd is None:
+            fd = os.open(path, os.O_RDONLY)
+            self._fds[path] = fd
+
+            # close least recently used file
+            if len(self._fds) > self._max_open:
+                os.close(self._fds.popitem(last=False)[1])
+        else:
+            self._fds.move_to_end(path)
+
+        return fd
+
+    def open(self, paths):
+        """
+        Opens multiple files in advance (e.g. before starting worker
+        processes); files exceeding the capacity of the table are not opened
+
+        Parameters
+        ----------
+        paths : iterable
+            the paths of the files to open
+
+        """
+        for path in paths:
+            if path not in self._fds and len(self._fds) >= self._max_open:
+                break
+
+            try:
+                self.get(path)
+            except OSError:
+                # the loading function will report missing files
+                pass
+
+    def close(self):
+        """
+        Closes all open files
+
+        """
+        while self._fds:
+            os.close(self._fds.popitem()[1])
+
+    def __del__(self):
+        self.close()
+
+    def __reduce__(self):
+        # only pass the files to the child process, which is currently
+        # started
+        if context.get_spawning_popen() is None:
+            return self.__class__, (self._max_open,)
+
+        return _rebuild_file_table, (self._max_open,
+                                     [(path, reduction.DupFd(fd))
+                                      for path, fd in self._fds.items()])
+
+
+def _rebuild_file_table(max_open, shared_fds):
+    """
+    Restores a :class:`FileTable` from the file descriptors passed to a child
+    process
+
+    Parameters
+    ----------
+    max_open : int
+        the maximum number of files kept open at once
+    shared_fds : list
+        tuples of path and the passed file descriptor for each open file
+
+    Returns
+    -------
+    :class:`FileTable`
+        the restored table
+
+    """
+    table = FileTable(max_open)
+    for path, dup_fd in shared_fds:
+        table._fds[path] = dup_fd.detach()
+
+    return table
+
+
+def advise_willneed(paths, file_table=None):
+    """
+    Tells the kernel that the given files are going to be read soon, which
+    starts reading all of them into the page cache in the background at
+    once, instead of waiting for each read when the files are loaded one
+    after another. Does nothing on platforms without ``posix_fadvise``
+
+    Parameters
+    ----------
+    paths : iterable
+        the paths of the files to read
+    file_table : :class:`FileTable`
+        table to keep the files open in; if None: each file is opened and
+        closed again
+
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+
+    for path in paths:
+        try:
+            if file_table is None:
+                fd = os.open(path, os.O_RDONLY)
+            else:
+                fd = file_table.get(path)
+        except OSError:
+            # the loading function will report missing files
+            continue
+
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            if file_table is None:
+                os.close(fd)
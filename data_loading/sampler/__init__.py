@@ -1,9 +1,54 @@
-from .abstract_sampler import AbstractSampler
-from .lambda_sampler import LambdaSampler
-from .random_sampler import RandomSampler, PerClassRandomSampler, \
-    StoppingPerClassRandomSampler
-from .sequential_sampler import SequentialSampler, \
-    PerClassSequentialSampler, StoppingPerClassSequentialSampler
-from .weighted_sampler import WeightedRandomSampler, \
-    WeightedPrevalenceRandomSampler
-from .batch_sampler import BatchSampler
+import importlib
+
+# all samplers and the modules (relative to this package) they are imported
+# from; the modules are only imported once a sampler is accessed for the
+# first time (PEP 562)
+_LAZY = {
+    "AbstractSampler": "abstract_sampler",
+    "LambdaSampler": "lambda_sampler",
+    "RandomSampler": "random_sampler",
+    "PerClassRandomSampler": "random_sampler",
+    "StoppingPerClassRandomSampler": "random_sampler",
+    "SequentialSampler": "sequential_sampler",
+    "PerClassSequentialSampler": "sequential_sampler",
+    "StoppingPerClassSequentialSampler": "sequential_sampler",
+    "WeightedRandomSampler": "weighted_sampler",
+    "WeightedPrevalenceRandomSampler": "weighted_sampler",
+    "BatchSampler": "batch_sampler",
+}
+
+__all__ = list(_LAZY.keys())
+
+
+def __getattr__(name):
+    """
+    Imports the module of a sampler on first access and caches the sampler
+    in the package namespace
+
+    Parameters
+    ----------
+    name : str
+        the name to access
+
+    Returns
+    -------
+    type
+        the sampler class
+
+    Raises
+    ------
+    AttributeError
+        if the name is unknown
+
+    """
+    if name not in _LAZY:
+        raise AttributeError("module %r has no attribute %r"
+                             % (__name__, name))
+
+    val = getattr(importlib.import_module("." + _LAZY[name], __name__), name)
+    globals()[name] = val
+    return val
+
+
+def __dir__():
+    return sorted(set(globals().keys()) | set(_LAZY.keys()))
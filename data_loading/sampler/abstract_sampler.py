@@ -1,6 +1,10 @@
+import typing
 from abc import abstractmethod
 
-from ..dataset import AbstractDataset
+# the dataset module is only imported for type checking, since it pulls in
+# heavy dependencies
+if typing.TYPE_CHECKING:
+    from ..dataset import AbstractDataset
 
 
 class AbstractSampler(object):
@@ -13,7 +17,7 @@ class AbstractSampler(object):
         self._num_samples = len(indices)
 
     @classmethod
-    def from_dataset(cls, dataset: AbstractDataset, **kwargs):
+    def from_dataset(cls, dataset: "AbstractDataset", **kwargs):
         """
         Classmethod to initialize the sampler from a given dataset
 
@@ -31,6 +35,27 @@ class AbstractSampler(object):
         indices = list(range(len(dataset)))
         return cls(indices, **kwargs)
 
+    @classmethod
+    def get_subset_kwargs(cls, indices, **kwargs):
+        """
+        Classmethod to adapt the sampler's keyword arguments to a subset of
+        the data, e.g. to create a sampler of the same kind for the subset
+
+        Parameters
+        ----------
+        indices : iterable
+            the indices of the subset
+        **kwargs :
+            the keyword arguments of the sampler for the whole data
+
+        Returns
+        -------
+        dict
+            the keyword arguments of the sampler for the subset
+
+        """
+        return kwargs
+
     @abstractmethod
     def _get_next_index(self):
         """
@@ -7,6 +7,16 @@ class BatchSampler(object):
         self._batchsize = batch_size
         self._truncate = truncate
 
+        # the length of the sampler is fixed after construction, so the
+        # number of batches is only computed once
+        num_batches, remainder = divmod(len(sampler), batch_size)
+
+        # the last (smaller) batch is only dropped if truncating
+        if not truncate and remainder:
+            num_batches += 1
+
+        self._num_batches = num_batches
+
     def __iter__(self):
         batch_idxs = []
 
@@ -22,9 +32,4 @@ class BatchSampler(object):
             yield batch_idxs
 
     def __len__(self):
-        num_batches = len(self._sampler) // self._batchsize
-
-        if self._truncate:
-            num_batches += int(bool(self._sampler % self._batchsize))
-
-        return num_batches
+        return self._num_batches
@@ -4,7 +4,6 @@ from numpy import concatenate
 from numpy.random import choice, shuffle
 
 from .abstract_sampler import AbstractSampler
-from ..dataset import AbstractDataset
 from delira.data_loading.sampler.prevalence_sampler import PerClassSampler, \
     StoppingPerClassSampler
 
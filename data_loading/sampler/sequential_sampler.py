@@ -2,7 +2,6 @@ from collections import OrderedDict
 from random import shuffle
 
 from .abstract_sampler import AbstractSampler
-from ..dataset import AbstractDataset
 
 from delira.data_loading.sampler.prevalence_sampler import PerClassSampler, \
     StoppingPerClassSampler
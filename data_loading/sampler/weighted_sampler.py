@@ -1,8 +1,12 @@
+import typing
+
 import numpy as np
 from numpy.random import choice
 
 from .abstract_sampler import AbstractSampler
-from ..dataset import AbstractDataset
+
+if typing.TYPE_CHECKING:
+    from ..dataset import AbstractDataset
 
 
 class WeightedRandomSampler(AbstractSampler):
@@ -35,7 +39,7 @@ class WeightedRandomSampler(AbstractSampler):
         return choice(self._indices, p=self._weights)
 
     @classmethod
-    def from_dataset(cls, dataset: AbstractDataset, **kwargs):
+    def from_dataset(cls, dataset: "AbstractDataset", **kwargs):
         """
 
         Classmethod to initialize the sampler from a given dataset
@@ -54,6 +58,32 @@ class WeightedRandomSampler(AbstractSampler):
         labels = [d['label'] for d in dataset]
         return cls(labels, **kwargs)
 
+    @classmethod
+    def get_subset_kwargs(cls, indices, **kwargs):
+        """
+        Classmethod to adapt the sampler's keyword arguments to a subset of
+        the data; the sampling weights are re-indexed and re-normalized
+
+        Parameters
+        ----------
+        indices : iterable
+            the indices of the subset
+        **kwargs :
+            the keyword arguments of the sampler for the whole data
+
+        Returns
+        -------
+        dict
+            the keyword arguments of the sampler for the subset
+
+        """
+        weights = kwargs.get("weights")
+        if weights is not None:
+            weights = np.asarray(weights, dtype=np.float64)[list(indices)]
+            kwargs["weights"] = weights / weights.sum()
+
+        return kwargs
+
 
 class WeightedPrevalenceRandomSampler(WeightedRandomSampler):
     def __init__(self, indices):
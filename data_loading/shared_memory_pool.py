@@ -0,0 +1,248 @@
+import multiprocessing
+import os
+import weakref
+from collections import namedtuple
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+# alignment (in bytes) of every array inside a segment
+_ALIGNMENT = 64
+
+SegmentDescriptor = namedtuple("SegmentDescriptor",
+                               ["segment_idx", "arrays", "others"])
+SegmentDescriptor.__doc__ = """
+Small, cheaply picklable description of a batch, which has been written to a
+segment of a :class:`SharedMemorySegmentPool`
+
+Parameters
+----------
+segment_idx : int
+    the index of the segment holding the array data
+arrays : dict
+    mapping the batch keys to tuples of ``(dtype, shape, offset)`` for all
+    arrays stored inside the segment
+others : dict
+    all batch entries, which could not be stored inside the segment (e.g.
+    python objects) and are therefore pickled as usual
+"""
+
+
+def _align(offset):
+    """
+    Rounds up an offset to the next multiple of the segment alignment
+
+    Parameters
+    ----------
+    offset : int
+        the offset to align
+
+    Returns
+    -------
+    int
+        the aligned offset
+
+    """
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+class _Segment(SharedMemory):
+    """
+    A shared memory segment, which may be garbage collected while batches
+    still reference its memory. The memory stays mapped until the last of
+    them has been garbage collected as well
+
+    """
+
+    def __del__(self):
+        try:
+            self.close()
+        except BufferError:
+            pass
+
+
+class SharedMemorySegmentPool(object):
+    """
+    A pool of equally sized shared memory segments, which is used to transport
+    batches from the worker processes to the main process without pickling
+    and copying the array data through a pipe.
+
+    Workers copy the arrays of a batch into a free segment and only send a
+    small :class:`SegmentDescriptor` to the main process, which restores the
+    arrays as views onto the segment. The segment is released back to the pool
+    as soon as all of these views have been garbage collected.
+
+    """
+
+    def __init__(self, segment_size, count):
+        """
+
+        Parameters
+        ----------
+        segment_size : int
+            the size of each segment in bytes; batches exceeding this size
+            cannot be stored inside the pool
+        count : int
+            the number of segments
+
+        """
+        self._segment_size = int(segment_size)
+        self._segments = [_Segment(create=True, size=self._segment_size)
+                          for _ in range(count)]
+
+        # flags marking the free segments; protected by the lock
+        self._free = multiprocessing.Array('b', [1] * count, lock=False)
+        self._lock = multiprocessing.Lock()
+
+        self._owner_pid = os.getpid()
+
+    @property
+    def segment_size(self):
+        """
+        Property to access the size of each segment
+
+        Returns
+        -------
+        int
+            the segment size in bytes
+
+        """
+        return self._segment_size
+
+    def _acquire(self):
+        """
+        Marks the first free segment as used
+
+        Returns
+        -------
+        int or None
+            the index of the acquired segment or None if no segment is free
+
+        """
+        with self._lock:
+            for idx, free in enumerate(self._free):
+                if free:
+                    self._free[idx] = 0
+                    return idx
+        return None
+
+    def release(self, segment_idx):
+        """
+        Releases a segment back to the pool
+
+        Parameters
+        ----------
+        segment_idx : int
+            the index of the segment to release
+
+        """
+        with self._lock:
+            self._free[segment_idx] = 1
+
+    def write(self, data, channels_last=False):
+        """
+        Writes all arrays of a batch into a free segment
+
+        Parameters
+        ----------
+        data : Any
+            the batch to write; only dicts can be written to the pool
+        channels_last : bool
+            whether to move the channel axis (the second one) of all arrays
+            with at least four dimensions to the end while writing them
+
+        Returns
+        -------
+        :class:`SegmentDescriptor` or None
+            the descriptor of the written batch; None if the batch could not
+            be written to the pool (because it is no dict, it is too large or
+            all segments are currently in use). In this case the batch must be
+            transported otherwise.
+
+        """
+        if not isinstance(data, dict):
+            return None
+
+        arrays, others, sources = {}, {}, {}
+        offset = 0
+
+        # compute the layout of the batch inside the segment
+        for key, val in data.items():
+            if isinstance(val, np.ndarray) and not val.dtype.hasobject:
+                # the axes are only moved by the copy into the segment
+                if channels_last and val.ndim >= 4:
+                    val = np.moveaxis(val, 1, -1)
+                sources[key] = val
+
+                offset = _align(offset)
+                arrays[key] = (val.dtype.str, val.shape, offset)
+                offset += val.nbytes
+            else:
+                others[key] = val
+
+        if not arrays or offset > self._segment_size:
+            return None
+
+        # every batch in flight is already bounded by the augmenter, so if no
+        # segment is free, the consumer still holds older batches and we do
+        # not wait for them to be released
+        segment_idx = self._acquire()
+        if segment_idx is None:
+            return None
+
+        buffer = self._segments[segment_idx].buf
+        for key, (dtype, shape, offset) in arrays.items():
+            np.copyto(np.ndarray(shape, dtype, buffer=buffer, offset=offset),
+                      sources[key])
+
+        return SegmentDescriptor(segment_idx, arrays, others)
+
+    def read(self, descriptor):
+        """
+        Restores a batch from a segment without copying the array data.
+        The segment is released once all returned arrays (and all views onto
+        them) have been garbage collected
+
+        Parameters
+        ----------
+        descriptor : :class:`SegmentDescriptor`
+            the descriptor of the batch to restore
+
+        Returns
+        -------
+        dict
+            the restored batch
+
+        """
+        # all arrays are views onto this base array, which therefore stays
+        # alive until the last of them is garbage collected
+        base = np.frombuffer(self._segments[descriptor.segment_idx].buf,
+                             dtype=np.uint8)
+        finalizer = weakref.finalize(base, self.release,
+                                     descriptor.segment_idx)
+        finalizer.atexit = False
+
+        data = dict(descriptor.others)
+        for key, (dtype, shape, offset) in descriptor.arrays.items():
+            data[key] = np.ndarray(shape, dtype, buffer=base, offset=offset)
+
+        return data
+
+    def close(self):
+        """
+        Closes all segments and unlinks them, if called from the process
+        which created the pool
+
+        """
+        for segment in self._segments:
+            try:
+                segment.close()
+            except BufferError:
+                # the segment is still referenced by a batch and will be
+                # unmapped once the batch has been garbage collected
+                pass
+
+            if os.getpid() == self._owner_pid:
+                segment.unlink()
+
+        self._segments = []
@@ -48,7 +48,7 @@ setup(
     long_description_content_type='text/markdown',
     install_requires=requirements,
     tests_require=["coverage"],
-    python_requires=">=3.5",
+    python_requires=">=3.8",
     author="Justus Schock",
     author_email="justus.schock@rwth-aachen.de",
     license="MIT",
@@ -0,0 +1,246 @@
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from data_loading.augmenter import Augmenter, _pack_indices, \
+    _unpack_indices, DEFAULT_SHARED_MEMORY_SIZE
+from data_loading.data_loader import DataLoader
+from data_loading.sampler import AbstractSampler
+
+
+class _PermutationSampler(AbstractSampler):
+    """
+    Samples each index exactly once per epoch in random order
+
+    """
+
+    def __init__(self, indices, shuffle=True):
+        super().__init__(indices)
+        self._indices = list(range(len(indices)))
+        self._shuffle = shuffle
+        self._order = iter([])
+
+    def __iter__(self):
+        order = self._indices
+        if self._shuffle:
+            order = np.random.permutation(order).tolist()
+        self._order = iter(order)
+        return super().__iter__()
+
+    def _get_next_index(self):
+        return next(self._order)
+
+
+def _fail_on_label_8(**data):
+    """
+    Transform raising for the batch containing the label 8
+
+    """
+    if 8 in data["label"]:
+        raise ValueError("Invalid label")
+    return data
+
+
+def _failing_close():
+    """
+    Generator raising when it is closed early
+
+    """
+    try:
+        for i in range(4):
+            yield i
+    finally:
+        raise ValueError("Invalid state")
+
+
+def _add_random_value(**data):
+    """
+    Transform adding a random value to the batch
+
+    """
+    data["random"] = np.random.randint(2 ** 31)
+    return data
+
+
+class AugmenterTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.data = [{"data": np.full((3, 4, 4), i, dtype=np.float32),
+                      "label": i} for i in range(20)]
+
+    def test_pack_indices(self):
+        for batches in ([[0, 1, 2]], [[3], [4, 5], [6, 7, 8]],
+                        [[2 ** 40, 1]], [[]]):
+            with self.subTest(batches=batches):
+                self.assertEqual(_unpack_indices(_pack_indices(batches)),
+                                 batches)
+
+    def test_pack_invalid_indices(self):
+        for batches in ([[0, 1.5]], [[0], [True, False]], [["0"]]):
+            with self.subTest(batches=batches), \
+                    self.assertRaises(TypeError):
+                _pack_indices(batches)
+
+    def _check_epoch(self, augmenter):
+        labels = []
+        for batch in augmenter:
+            self.assertEqual(batch["data"].shape[1:], (3, 4, 4))
+            np.testing.assert_array_equal(batch["data"][:, 0, 0, 0],
+                                          batch["label"])
+            labels.extend(batch["label"].tolist())
+
+        self.assertEqual(sorted(labels), list(range(20)))
+
+    def test_augmenter(self):
+        for kwargs in ({"num_processes": 0},
+                       {"num_processes": 2},
+                       {"num_processes": 2,
+                        "shared_memory_size": DEFAULT_SHARED_MEMORY_SIZE}):
+            with self.subTest(**kwargs):
+                augmenter = Augmenter(DataLoader(self.data),
+                                      _PermutationSampler(list(range(20))),
+                                      batch_size=3, **kwargs)
+                self._check_epoch(augmenter)
+                augmenter.close()
+
+    def test_coalesce(self):
+        augmenter = Augmenter(DataLoader(self.data),
+                              _PermutationSampler(list(range(20))),
+                              num_processes=2, batch_size=3,
+                              coalesce_max_batches=2, coalesce_window_ms=5)
+        self._check_epoch(augmenter)
+        augmenter.close()
+
+    def test_persistent_workers(self):
+        augmenter = Augmenter(DataLoader(self.data),
+                              _PermutationSampler(list(range(20))),
+                              num_processes=2, batch_size=4,
+                              persistent_workers=True,
+                              shared_memory_size=DEFAULT_SHARED_MEMORY_SIZE)
+
+        for _ in range(2):
+            self._check_epoch(augmenter)
+
+        augmenter.close()
+
+    def test_persistent_workers_failed_drain(self):
+        augmenter = Augmenter(DataLoader(self.data),
+                              _PermutationSampler(list(range(20)),
+                                                  shuffle=False),
+                              num_processes=2, batch_size=4,
+                              transforms=_fail_on_label_8,
+                              persistent_workers=True)
+
+        # the failing batch is still enqueued when the epoch is left
+        for _ in range(2):
+            for batch in augmenter:
+                self.assertNotIn(8, batch["label"].tolist())
+                break
+
+            self.assertFalse(augmenter._augmenter._processes_running)
+            self.assertEqual(augmenter._augmenter._processes, [])
+
+        augmenter.close()
+
+    def test_prefetch(self):
+        for kwargs in ({"num_processes": 0},
+                       {"num_processes": 2}):
+            with self.subTest(**kwargs):
+                augmenter = Augmenter(DataLoader(self.data),
+                                      _PermutationSampler(list(range(20))),
+                                      batch_size=3, prefetch=2, **kwargs)
+                self._check_epoch(augmenter)
+                augmenter.close()
+
+    def test_prefetch_failed_batch(self):
+        augmenter = Augmenter(DataLoader(self.data),
+                              _PermutationSampler(list(range(20)),
+                                                  shuffle=False),
+                              num_processes=2, batch_size=4, prefetch=1,
+                              transforms=_fail_on_label_8)
+
+        # the failing batch is still enqueued when the epoch is left
+        for batch in augmenter:
+            self.assertNotIn(8, batch["label"].tolist())
+            break
+
+        self.assertFalse(augmenter._augmenter._processes_running)
+        augmenter.close()
+
+    def test_prefetch_failed_close(self):
+        batches = Augmenter._background_iter(_failing_close, 1)
+        self.assertEqual(next(batches), 0)
+
+        with self.assertRaises(ValueError):
+            batches.close()
+
+    def test_pin_memory(self):
+        torch = mock.MagicMock()
+        pinned_tensor = torch.as_tensor.return_value.pin_memory.return_value
+
+        for kwargs in ({"num_processes": 0},
+                       {"num_processes": 2}):
+            with self.subTest(**kwargs), \
+                    mock.patch.dict(sys.modules, {"torch": torch}):
+                torch.reset_mock()
+                augmenter = Augmenter(DataLoader(self.data),
+                                      _PermutationSampler(list(range(20))),
+                                      batch_size=4, pin_memory=True,
+                                      **kwargs)
+
+                num_batches = 0
+                for batch in augmenter:
+                    self.assertIs(batch["data"], pinned_tensor)
+                    self.assertIs(batch["label"], pinned_tensor)
+                    num_batches += 1
+                augmenter.close()
+
+                self.assertEqual(num_batches, 5)
+                self.assertEqual(torch.as_tensor.call_count, 10)
+
+    def test_return_tensors(self):
+        torch = mock.MagicMock()
+        torch.from_numpy.side_effect = lambda array: ("tensor", array)
+
+        with mock.patch.dict(sys.modules, {"torch": torch}):
+            augmenter = Augmenter(
+                DataLoader(self.data), _PermutationSampler(list(range(20))),
+                num_processes=2, batch_size=4, return_tensors=True,
+                shared_memory_size=DEFAULT_SHARED_MEMORY_SIZE)
+
+            labels = []
+            for batch in augmenter:
+                # the received arrays are wrapped without copying them
+                kind, data = batch["data"]
+                self.assertEqual(kind, "tensor")
+                self.assertEqual(data.shape, (4, 3, 4, 4))
+                labels.extend(batch["label"][1].tolist())
+            augmenter.close()
+
+        self.assertEqual(sorted(labels), list(range(20)))
+
+    def test_worker_seeds(self):
+        augmenter = Augmenter(DataLoader(self.data),
+                              _PermutationSampler(list(range(20))),
+                              num_processes=2, batch_size=2,
+                              transforms=_add_random_value)
+
+        # the workers' random streams differ within and across epochs
+        values = [batch["random"] for _ in range(2) for batch in augmenter]
+        augmenter.close()
+
+        self.assertEqual(len(values), 20)
+        self.assertEqual(len(set(values)), 20)
+
+    def test_invalid_sampler(self):
+        for num_processes in (0, 2):
+            with self.subTest(num_processes=num_processes), \
+                    self.assertRaises(ValueError):
+                Augmenter(DataLoader(self.data), list(range(20)),
+                          num_processes=num_processes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+
+from data_loading.sampler import AbstractSampler, BatchSampler
+
+
+class _OrderedSampler(AbstractSampler):
+    """
+    Samples all indices in order
+
+    """
+
+    def __init__(self, indices):
+        super().__init__(indices)
+        self._order = iter([])
+
+    def __iter__(self):
+        self._order = iter(range(self._num_samples))
+        return super().__iter__()
+
+    def _get_next_index(self):
+        return next(self._order)
+
+
+class BatchSamplerTest(unittest.TestCase):
+
+    def test_batches(self):
+        for num_samples, truncate, expected in (
+                (6, False, [[0, 1, 2], [3, 4, 5]]),
+                (7, False, [[0, 1, 2], [3, 4, 5], [6]]),
+                (7, True, [[0, 1, 2], [3, 4, 5]]),
+                (2, True, [])):
+            with self.subTest(num_samples=num_samples, truncate=truncate):
+                sampler = BatchSampler(
+                    _OrderedSampler(list(range(num_samples))), 3,
+                    truncate=truncate)
+
+                self.assertEqual(list(sampler), expected)
+                self.assertEqual(len(sampler), len(expected))
+
+    def test_len_cached(self):
+        sampler = _OrderedSampler(list(range(7)))
+        batch_sampler = BatchSampler(sampler, 3)
+
+        # the length is computed once on construction
+        sampler._num_samples = 0
+        self.assertEqual(len(batch_sampler), 3)
+        self.assertEqual(len(batch_sampler), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
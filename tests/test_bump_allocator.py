@@ -0,0 +1,48 @@
+import unittest
+
+import numpy as np
+
+from data_loading.bump_allocator import BumpAllocator
+
+
+class BumpAllocatorTest(unittest.TestCase):
+
+    def test_allocate(self):
+        arena = BumpAllocator(1024, alignment=64)
+        self.assertEqual(arena.capacity, 1024)
+
+        first = arena.allocate((3,), np.float32)
+        second = arena.allocate((2, 4), "int64")
+
+        self.assertEqual(first.shape, (3,))
+        self.assertEqual(first.dtype, np.float32)
+        self.assertEqual(second.shape, (2, 4))
+        self.assertEqual(second.dtype, np.int64)
+
+        # allocations are aligned and do not overlap
+        first_ptr = first.__array_interface__["data"][0]
+        second_ptr = second.__array_interface__["data"][0]
+        self.assertEqual(second_ptr - first_ptr, 64)
+        first[:] = 1
+        second[:] = 2
+        np.testing.assert_array_equal(first, np.ones(3))
+
+    def test_allocate_exhausted(self):
+        arena = BumpAllocator(128)
+
+        self.assertIsNotNone(arena.allocate((16,), np.float64))
+        self.assertIsNone(arena.allocate((1,), np.float64))
+
+    def test_reset(self):
+        arena = BumpAllocator(128)
+
+        first = arena.allocate((16,), np.float64)
+        arena.reset()
+        second = arena.allocate((16,), np.float64)
+
+        # the memory is re-used after resetting
+        self.assertTrue(np.shares_memory(first, second))
+
+
+if __name__ == '__main__':
+    unittest.main()
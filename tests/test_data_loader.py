@@ -0,0 +1,100 @@
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from data_loading.data_loader import DataLoader, PinnedBatch
+
+
+class DataLoaderTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.data = [{"data": np.full((2, 3), i, dtype=np.float32),
+                      "label": i, "name": "sample%d" % i}
+                     for i in range(5)]
+
+    def test_batch(self):
+        batch = DataLoader(self.data)([1, 3, 4])
+
+        self.assertIsInstance(batch, dict)
+        self.assertEqual(batch["data"].shape, (3, 2, 3))
+        self.assertEqual(batch["data"].dtype, np.float32)
+        np.testing.assert_array_equal(batch["data"][:, 0, 0], [1, 3, 4])
+        np.testing.assert_array_equal(batch["label"], [1, 3, 4])
+        np.testing.assert_array_equal(batch["name"],
+                                      ["sample1", "sample3", "sample4"])
+
+    def test_io_concurrency(self):
+        batch = DataLoader(self.data, io_concurrency=2)([0, 2, 4])
+        np.testing.assert_array_equal(batch["label"], [0, 2, 4])
+
+    def test_layout(self):
+        loader = DataLoader(self.data,
+                            layout={"data": ((2, 3), "float64"),
+                                    "label": ((), "int32"),
+                                    "name": None})
+        batch = loader([0, 1])
+        self.assertEqual(batch["data"].dtype, np.float64)
+        self.assertEqual(batch["label"].dtype, np.int32)
+
+    def test_mismatch(self):
+        # shape
+        data = self.data + [{"data": np.zeros((3, 3)), "label": 5,
+                             "name": "sample5"}]
+        with self.assertRaises(ValueError):
+            DataLoader(data)([0, 5])
+
+        # keys
+        data = self.data + [{"data": np.zeros((2, 3)), "labels": 5,
+                             "name": "sample5"}]
+        with self.assertRaises(ValueError):
+            DataLoader(data)([0, 5])
+
+    def test_dtype_mismatch(self):
+        data = self.data + [{"data": np.zeros((2, 3), dtype=np.float32),
+                             "label": 0.7, "name": "sample5"}]
+        with self.assertRaises(ValueError):
+            DataLoader(data)([0, 5])
+
+    def test_dtype_narrowing(self):
+        for first, second in ((np.int16(1), np.int32(70000)),
+                              (np.int8(1), np.int64(300)),
+                              (np.float16(1), np.float64(1e6)),
+                              (np.float32(1), np.float64(0.5))):
+            with self.subTest(first=first, second=second):
+                with self.assertRaises(ValueError):
+                    DataLoader([{"x": first}, {"x": second}])([0, 1])
+
+    def test_dtype_widening(self):
+        for first, second in ((np.float64(1), np.float32(0.5)),
+                              (np.int64(1), np.int16(-3)),
+                              (np.float32(1), np.int8(2)),
+                              (np.float64(1), 70000)):
+            with self.subTest(first=first, second=second):
+                batch = DataLoader([{"x": first}, {"x": second}])([0, 1])
+                self.assertEqual(batch["x"].dtype, first.dtype)
+                np.testing.assert_array_equal(batch["x"], [first, second])
+
+        # python scalars are stored if their value fits
+        batch = DataLoader([{"x": 5}], layout={"x": ((), "int16")})([0])
+        np.testing.assert_array_equal(batch["x"], [5])
+
+    def test_pin_memory(self):
+        torch = mock.MagicMock()
+        batch = DataLoader(self.data)([0, 1])
+        data, name = batch["data"], batch["name"]
+
+        with mock.patch.dict(sys.modules, {"torch": torch}):
+            pinned = PinnedBatch(batch).pin_memory()
+
+        # only numeric arrays are converted
+        pinned_tensor = torch.as_tensor.return_value.pin_memory.return_value
+        self.assertIs(pinned["data"], pinned_tensor)
+        self.assertIs(pinned["label"], pinned_tensor)
+        self.assertIs(pinned["name"], name)
+        self.assertIs(torch.as_tensor.call_args_list[0][0][0], data)
+
+
+if __name__ == '__main__':
+    unittest.main()
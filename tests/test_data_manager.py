@@ -0,0 +1,205 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+from batchgenerators.transforms import AbstractTransform, Compose
+
+from data_loading import data_manager
+from data_loading.data_manager import DataManager, _FusedTransforms
+from data_loading.dataset import AbstractDataset
+from data_loading.sampler import WeightedRandomSampler
+
+
+class _ListDataset(AbstractDataset):
+    """
+    Dataset holding a list of samples
+
+    """
+
+    def __init__(self, data):
+        super().__init__(None, None)
+        self.data = data
+
+    def _make_dataset(self, path):
+        pass
+
+    def __getitem__(self, index):
+        return self.data[index]
+
+
+class _AppendTransform(AbstractTransform):
+    """
+    Transform appending a value to the list of applied values
+
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self, **data_dict):
+        data_dict["applied"] = data_dict.get("applied", []) + [self.value]
+        return data_dict
+
+
+class _ReversedCompose(Compose):
+    """
+    Composition applying its transforms in reversed order
+
+    """
+
+    def __call__(self, **data_dict):
+        for transform in reversed(self.transforms):
+            data_dict = transform(**data_dict)
+        return data_dict
+
+
+class DataManagerTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.data = [{"data": np.full((3,), i, dtype=np.float32),
+                      "label": i % 2} for i in range(10)]
+
+    def test_subset_weighted_sampler(self):
+        weights = np.arange(1, 11, dtype=np.float64)
+        manager = DataManager(self.data, 2, 0, None,
+                              sampler_cls=WeightedRandomSampler,
+                              weights=weights / weights.sum())
+
+        subset = manager.get_subset([1, 4, 7])
+        self.assertEqual(len(subset.sampler), 3)
+
+        # the weights must be re-indexed to the subset and re-normalized
+        np.testing.assert_allclose(subset.sampler._weights,
+                                   np.array([2., 5., 8.]) / 15.)
+
+        n_batches = 0
+        for batch in subset.get_batchgen():
+            self.assertEqual(batch["data"].shape[1:], (3,))
+            n_batches += 1
+
+        self.assertEqual(n_batches, subset.n_batches)
+
+    def test_cached_lengths(self):
+        manager = DataManager(_ListDataset(self.data), 3, 0, None,
+                              sampler_cls=WeightedRandomSampler)
+        self.assertEqual(manager.n_samples, 10)
+        self.assertEqual(manager.n_batches, 4)
+
+        # the number of batches is invalidated by all its dependencies
+        manager.drop_last = True
+        self.assertEqual(manager.n_batches, 3)
+
+        manager.batch_size = 5
+        self.assertEqual(manager.n_batches, 2)
+
+        manager.sampler = WeightedRandomSampler(list(range(4)))
+        self.assertEqual(manager.n_samples, 4)
+        self.assertEqual(manager.n_batches, 0)
+
+    def test_config_snapshot(self):
+        manager = DataManager(_ListDataset(self.data), 3, 0, None,
+                              sampler_cls=WeightedRandomSampler,
+                              prefetch=2)
+        config = manager._snapshot_config(seed=5)
+
+        # later changes of the manager do not affect the snapshot
+        manager.batch_size = 4
+        manager.prefetch = 0
+
+        self.assertEqual(config.batch_size, 3)
+        self.assertEqual(config.prefetch, 2)
+        self.assertEqual(config.seed, 5)
+        self.assertIs(config.sampler, manager.sampler)
+        with self.assertRaises(AttributeError):
+            config.batch_size = 4
+
+        # the augmenter is created from a snapshot of the current config
+        batch_sizes = [len(batch["label"])
+                       for batch in manager.get_batchgen()]
+        self.assertEqual(batch_sizes, [4, 4, 2])
+
+    def test_debug_mode(self):
+        manager = DataManager(_ListDataset(self.data), 3, 4, None,
+                              sampler_cls=WeightedRandomSampler)
+
+        with mock.patch.object(data_manager, "get_current_debug_mode",
+                               return_value=True) as debug_mode:
+            # the debug mode is only checked when refreshing it
+            self.assertEqual(manager.n_process_augmentation, 4)
+            debug_mode.assert_not_called()
+
+            self.assertEqual(manager._snapshot_config(1).num_processes, 1)
+            self.assertEqual(manager.n_process_augmentation, 1)
+
+        manager.refresh_debug_mode()
+        self.assertEqual(manager.n_process_augmentation, 4)
+
+    def test_n_batches(self):
+        for batch_size, drop_last, n_batches in ((5, False, 2), (5, True, 2),
+                                                 (4, False, 3), (4, True, 2),
+                                                 (20, False, 1),
+                                                 (20, True, 0)):
+            with self.subTest(batch_size=batch_size, drop_last=drop_last):
+                manager = DataManager(_ListDataset(self.data), batch_size, 0,
+                                      None, sampler_cls=WeightedRandomSampler,
+                                      drop_last=drop_last)
+                self.assertEqual(manager.n_batches, n_batches)
+
+    def test_fused_transforms(self):
+        transforms = Compose([
+            _AppendTransform(0),
+            Compose([_AppendTransform(1), Compose([_AppendTransform(2)])]),
+            _ReversedCompose([_AppendTransform(3), _AppendTransform(4)])])
+
+        manager = DataManager(_ListDataset(self.data), 3, 0, transforms,
+                              sampler_cls=WeightedRandomSampler)
+        fused = manager._fused_transforms
+
+        # only sequential compositions are flattened
+        self.assertIsInstance(fused, _FusedTransforms)
+        self.assertEqual(len(fused.transforms), 4)
+        self.assertIsInstance(fused.transforms[-1], _ReversedCompose)
+        self.assertIs(manager.transforms, transforms)
+
+        self.assertEqual(fused()["applied"], transforms()["applied"])
+        self.assertEqual(fused()["applied"], [0, 1, 2, 4, 3])
+
+        # single transforms are applied as they are
+        manager.transforms = _AppendTransform(0)
+        self.assertIs(manager._fused_transforms, manager.transforms)
+
+    def test_persistent_workers(self):
+        manager = DataManager(_ListDataset(self.data), 3, 2, None,
+                              sampler_cls=WeightedRandomSampler,
+                              persistent_workers=True)
+        self.assertTrue(manager.get_subset([0, 1]).persistent_workers)
+
+        batchgen = manager.get_batchgen()
+        augmenter = batchgen._augmenter
+
+        # the workers of the first epoch are re-used in the second one
+        processes = None
+        for _ in range(2):
+            self.assertEqual(len(list(batchgen)), manager.n_batches)
+            self.assertTrue(augmenter._processes_running)
+
+            if processes is None:
+                processes = list(augmenter._processes)
+            self.assertEqual(augmenter._processes, processes)
+
+        batchgen.close()
+        self.assertFalse(augmenter._processes_running)
+
+    def test_io_concurrency(self):
+        manager = DataManager(_ListDataset(self.data), 3, 0, None,
+                              sampler_cls=WeightedRandomSampler,
+                              io_concurrency=2)
+        self.assertEqual(manager.get_subset([0, 1]).io_concurrency, 2)
+
+        batchgen = manager.get_batchgen()
+        self.assertEqual(batchgen._augmenter._data_loader._io_concurrency, 2)
+        self.assertEqual(len(list(batchgen)), manager.n_batches)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from unittest import mock
+
+import data_loading
+from data_loading import sampler
+from data_loading.data_loader import DataLoader
+from data_loading.sampler.batch_sampler import BatchSampler
+
+
+class LazyImportTest(unittest.TestCase):
+
+    def _uncache(self, module, name):
+        # remove a cached name from the package namespace for this test only
+        val = vars(module).pop(name, None)
+        if val is not None:
+            self.addCleanup(setattr, module, name, val)
+
+    def test_getattr(self):
+        self._uncache(data_loading, "DataLoader")
+
+        self.assertIs(data_loading.DataLoader, DataLoader)
+        self.assertIs(vars(data_loading)["DataLoader"], DataLoader)
+
+        with self.assertRaises(AttributeError):
+            data_loading.UnknownName
+
+    def test_dir(self):
+        names = dir(data_loading)
+
+        self.assertTrue(set(data_loading.__all__).issubset(names))
+        for name in data_loading._OPTIONAL:
+            if name not in vars(data_loading):
+                self.assertNotIn(name, names)
+
+    def test_missing_dependency(self):
+        self._uncache(data_loading, "NumbaTransform")
+        self._uncache(data_loading, "Augmenter")
+
+        with mock.patch.object(data_loading.importlib, "import_module",
+                               side_effect=ImportError("No module named "
+                                                       "'numba'")):
+            # missing optional dependencies only disable the name
+            self.assertFalse(hasattr(data_loading, "NumbaTransform"))
+
+            # missing required dependencies are reported as such
+            with self.assertRaises(ImportError):
+                data_loading.Augmenter
+
+    def test_sampler_getattr(self):
+        self._uncache(sampler, "BatchSampler")
+
+        self.assertIs(sampler.BatchSampler, BatchSampler)
+        self.assertIs(vars(sampler)["BatchSampler"], BatchSampler)
+        self.assertTrue(set(sampler.__all__).issubset(dir(sampler)))
+
+        with self.assertRaises(AttributeError):
+            sampler.UnknownSampler
+
+
+if __name__ == '__main__':
+    unittest.main()
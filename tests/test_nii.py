@@ -0,0 +1,201 @@
+import importlib
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import SimpleITK as sitk
+
+from data_loading import nii
+from data_loading.nii import load_nii, load_nii_cached, load_nii_into, \
+    load_nii_prefetch, load_nii_slice, _NiiCache
+
+
+class NiiTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.data = np.arange(2 * 3 * 4, dtype=np.int16).reshape(2, 3, 4)
+
+    def tearDown(self) -> None:
+        self._tmp_dir.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self._tmp_dir.name, name)
+
+    def _save_nib(self, name, byte_order="=", slope=None, inter=None):
+        path = self._path(name)
+        header = nii.nib.Nifti1Header().as_byteswapped(byte_order)
+        header.set_slope_inter(slope, inter)
+        nii.nib.save(nii.nib.Nifti1Image(self.data, np.eye(4), header), path)
+        return path
+
+    def _assert_equal_sitk(self, data, path):
+        expected = sitk.GetArrayFromImage(sitk.ReadImage(path))
+
+        self.assertEqual(data.dtype, expected.dtype)
+        self.assertTrue(data.dtype.isnative)
+        np.testing.assert_array_equal(data, expected)
+
+    @unittest.skipIf(nii.nib is None, "nibabel is not installed")
+    def test_load_mapped(self):
+        for byte_order in ("<", ">"):
+            for slope, inter in ((None, None), (0.5, 2.)):
+                with self.subTest(byte_order=byte_order, slope=slope):
+                    path = self._save_nib("image.nii", byte_order, slope,
+                                          inter)
+                    self._assert_equal_sitk(load_nii(path), path)
+
+    def test_load_decoded(self):
+        path = self._path("image.nii.gz")
+        sitk.WriteImage(sitk.GetImageFromArray(self.data), path)
+
+        with mock.patch.object(nii, "nib", None):
+            self._assert_equal_sitk(load_nii(path), path)
+
+    def test_cache(self):
+        path = self._path("image.nii.gz")
+        sitk.WriteImage(sitk.GetImageFromArray(self.data), path)
+
+        with mock.patch.object(nii, "NII_CACHE_BYTES", self.data.nbytes), \
+                mock.patch.object(nii, "_nii_cache", _NiiCache()):
+            data = load_nii(path)
+            self._assert_equal_sitk(data, path)
+
+            # the returned array is a copy of the cached image
+            data[...] = 0
+            self._assert_equal_sitk(load_nii(path), path)
+            self.assertEqual(len(nii._nii_cache._entries), 1)
+
+    def test_cache_eviction(self):
+        cache = _NiiCache()
+
+        with mock.patch.object(nii, "NII_CACHE_BYTES", 10):
+            for key, nbytes in (("a", 4), ("b", 4), ("c", 11)):
+                cache.put(key, (None, np.zeros(nbytes, dtype=np.uint8)))
+
+            # too large entries are not cached at all
+            self.assertIsNone(cache.get("c"))
+
+            # the least recently used entry is evicted once the cache is full
+            self.assertIsNotNone(cache.get("a"))
+            cache.put("d", (None, np.zeros(4, dtype=np.uint8)))
+
+            self.assertEqual(list(cache._entries), ["a", "d"])
+            self.assertEqual(cache._nbytes, 8)
+
+    def test_load_cached(self):
+        path = self._path("image.nii.gz")
+        sitk.WriteImage(sitk.GetImageFromArray(self.data), path)
+        cache_dir = self._path("cache")
+
+        for _ in range(2):
+            self._assert_equal_sitk(load_nii_cached(path, cache_dir), path)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+    def test_load_cached_default_dir(self):
+        path = self._path("image.nii.gz")
+        sitk.WriteImage(sitk.GetImageFromArray(self.data), path)
+
+        with mock.patch.dict(os.environ,
+                             {"XDG_CACHE_HOME": self._path("cache")}):
+            self._assert_equal_sitk(load_nii_cached(path), path)
+
+        self.assertEqual(
+            len(os.listdir(self._path(os.path.join("cache", "data_loading",
+                                                   "nii")))), 1)
+
+    def test_load_cached_failure(self):
+        path = self._path("image.nii.gz")
+        sitk.WriteImage(sitk.GetImageFromArray(self.data), path)
+        cache_dir = self._path("cache")
+
+        fds = []
+        _mkstemp = tempfile.mkstemp
+
+        def mkstemp(*args, **kwargs):
+            fd, tmp_path = _mkstemp(*args, **kwargs)
+            fds.append(fd)
+            return fd, tmp_path
+
+        with mock.patch.object(nii.tempfile, "mkstemp", mkstemp), \
+                mock.patch.object(nii, "_nii_array",
+                                  side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            load_nii_cached(path, cache_dir)
+
+        # neither the descriptor nor the temporary file are leaked
+        with self.assertRaises(OSError):
+            os.fstat(fds[0])
+        self.assertEqual(os.listdir(cache_dir), [])
+
+    def _save_files(self):
+        # a memory-mappable (if nibabel is installed) and a compressed file
+        paths = [self._path("image.nii"), self._path("image.nii.gz")]
+        for path in paths:
+            sitk.WriteImage(sitk.GetImageFromArray(self.data), path)
+        return paths
+
+    def test_load_into(self):
+        for path in self._save_files():
+            with self.subTest(path=os.path.basename(path)):
+                expected = sitk.GetArrayFromImage(sitk.ReadImage(path))
+                out = np.zeros((2,) + expected.shape, dtype=np.float32)
+                row = out[1]
+
+                self.assertIs(load_nii_into(path, row), row)
+                np.testing.assert_array_equal(out[1], expected)
+                np.testing.assert_array_equal(out[0], 0)
+
+    def test_load_slice(self):
+        for path in self._save_files():
+            expected = sitk.GetArrayFromImage(sitk.ReadImage(path))
+
+            for z_slice in (1, slice(1, 3), slice(None, None, 2)):
+                with self.subTest(path=os.path.basename(path),
+                                  z_slice=z_slice):
+                    data = load_nii_slice(path, z_slice)
+
+                    self.assertEqual(data.dtype, expected.dtype)
+                    np.testing.assert_array_equal(data, expected[z_slice])
+
+    def test_load_prefetch(self):
+        paths = []
+        for i in range(5):
+            paths.append(self._path("image%d.nii.gz" % i))
+            sitk.WriteImage(sitk.GetImageFromArray(self.data + i), paths[-1])
+
+        # the files are returned in order, also if more files are pending
+        # than loaded in advance
+        images = list(load_nii_prefetch(paths, max_workers=2, queue_depth=2))
+        self.assertEqual(len(images), 5)
+        for i, image in enumerate(images):
+            np.testing.assert_array_equal(image, self.data + i)
+
+        images = load_nii_prefetch(paths, max_workers=2, queue_depth=2)
+        np.testing.assert_array_equal(next(images), self.data)
+        images.close()
+
+    def test_label_generator(self):
+        path = self._path("labels.json")
+        with open(path, "w") as f:
+            json.dump({"label": [1, 2], "name": "sample"}, f)
+
+        class LabelGenerator(nii.BaseLabelGenerator):
+            def get_labels(self):
+                return self.data["label"]
+
+        # parsed with the standard json module if orjson is not installed
+        self.addCleanup(importlib.reload, nii)
+        with mock.patch.dict(sys.modules, {"orjson": None}):
+            importlib.reload(nii)
+        self.assertIs(nii._json_loads, json.loads)
+
+        self.assertEqual(LabelGenerator(path).get_labels(), [1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import multiprocessing
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+
+from data_loading.dataset import BaseLazyDataset
+from data_loading.readahead import advise_willneed, FileTable
+
+
+def _load_sample(path):
+    with open(path, "rb") as f:
+        return {"data": f.read()}
+
+
+def _read_table_files(file_table, conn):
+    conn.send({path: os.pread(fd, 16, 0)
+               for path, fd in file_table._fds.items()})
+    conn.close()
+
+
+class ReadaheadTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.paths = []
+        for i in range(4):
+            self.paths.append(os.path.join(self._tmp_dir.name,
+                                           "sample%d" % i))
+            with open(self.paths[-1], "wb") as f:
+                f.write(bytes([i]) * 16)
+
+    def tearDown(self) -> None:
+        self._tmp_dir.cleanup()
+
+    @unittest.skipUnless(hasattr(os, "posix_fadvise"),
+                         "posix_fadvise is not available")
+    def test_advise_willneed(self):
+        missing_path = os.path.join(self._tmp_dir.name, "missing")
+        file_table = FileTable()
+
+        for table in (None, file_table):
+            with self.subTest(file_table=table is not None), \
+                    mock.patch.object(os, "posix_fadvise") as fadvise:
+                advise_willneed(self.paths[:2] + [missing_path], table)
+
+                # missing files are skipped
+                self.assertEqual(fadvise.call_count, 2)
+
+        self.assertEqual(list(file_table._fds), self.paths[:2])
+        file_table.close()
+
+    def test_advise_willneed_unavailable(self):
+        # platforms without posix_fadvise (e.g. macOS or Windows)
+        if hasattr(os, "posix_fadvise"):
+            self.addCleanup(setattr, os, "posix_fadvise", os.posix_fadvise)
+            del os.posix_fadvise
+
+        file_table = FileTable()
+        advise_willneed(self.paths, file_table)
+        self.assertEqual(len(file_table._fds), 0)
+
+    @unittest.skipUnless(hasattr(os, "posix_fadvise"),
+                         "posix_fadvise is not available")
+    def test_lazy_dataset(self):
+        for readahead in (False, True):
+            with self.subTest(readahead=readahead), \
+                    mock.patch.object(os, "posix_fadvise") as fadvise:
+                dataset = BaseLazyDataset(self.paths, _load_sample,
+                                          readahead=readahead)
+                dataset.prefetch([1, 2])
+
+                self.assertEqual(fadvise.call_count, 2 if readahead else 0)
+                self.assertEqual(dataset[2]["data"], bytes([2]) * 16)
+
+    def test_file_table(self):
+        file_table = FileTable(max_open=2)
+
+        fd = file_table.get(self.paths[1])
+        file_table.get(self.paths[0])
+        self.assertEqual(file_table.get(self.paths[1]), fd)
+
+        # the least recently used file is closed
+        evicted_fd = file_table._fds[self.paths[0]]
+        file_table.get(self.paths[2])
+        self.assertEqual(list(file_table._fds), self.paths[1:3])
+        with self.assertRaises(OSError):
+            os.fstat(evicted_fd)
+
+        file_table.close()
+        with self.assertRaises(OSError):
+            os.fstat(fd)
+
+    def test_file_table_open(self):
+        missing_path = os.path.join(self._tmp_dir.name, "missing")
+        file_table = FileTable(max_open=2)
+
+        # missing files are skipped and no files are opened beyond capacity
+        file_table.open([missing_path] + self.paths)
+        self.assertEqual(list(file_table._fds), self.paths[:2])
+
+        # tables are restored empty, if no process is started
+        restored = pickle.loads(pickle.dumps(file_table))
+        self.assertEqual(restored._max_open, 2)
+        self.assertEqual(len(restored._fds), 0)
+
+        file_table.close()
+
+    def test_file_table_spawn(self):
+        file_table = FileTable()
+        file_table.open(self.paths[:2])
+
+        # the child can only read the files via the passed descriptors
+        for path in self.paths[:2]:
+            os.remove(path)
+
+        ctx = multiprocessing.get_context("spawn")
+        recv_conn, send_conn = ctx.Pipe(duplex=False)
+        process = ctx.Process(target=_read_table_files,
+                              args=(file_table, send_conn))
+        process.start()
+        send_conn.close()
+
+        self.assertEqual(recv_conn.recv(),
+                         {self.paths[0]: bytes([0]) * 16,
+                          self.paths[1]: bytes([1]) * 16})
+        process.join()
+        recv_conn.close()
+        file_table.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import gc
+import unittest
+
+import numpy as np
+
+from data_loading.shared_memory_pool import SharedMemorySegmentPool, \
+    SegmentDescriptor
+
+
+class SharedMemorySegmentPoolTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.pool = SharedMemorySegmentPool(1024, 2)
+
+    def tearDown(self) -> None:
+        self.pool.close()
+
+    def test_write_read(self):
+        data = {"data": np.arange(12, dtype=np.float32).reshape(3, 4),
+                "label": np.arange(3), "name": ["a", "b", "c"]}
+
+        descriptor = self.pool.write(data)
+        self.assertIsInstance(descriptor, SegmentDescriptor)
+        self.assertEqual(set(descriptor.arrays.keys()), {"data", "label"})
+        self.assertEqual(descriptor.others, {"name": ["a", "b", "c"]})
+
+        restored = self.pool.read(descriptor)
+        for key, val in data.items():
+            np.testing.assert_array_equal(restored[key], val)
+        self.assertEqual(restored["data"].dtype, np.float32)
+
+        # all arrays are aligned inside the segment
+        for _, _, offset in descriptor.arrays.values():
+            self.assertEqual(offset % 64, 0)
+
+    def test_write_channels_last(self):
+        data = {"data": np.random.rand(2, 3, 4, 5).astype(np.float32),
+                "seg": np.random.rand(2, 4, 5).astype(np.float32)}
+
+        restored = self.pool.read(self.pool.write(data, channels_last=True))
+        np.testing.assert_array_equal(restored["data"],
+                                      np.moveaxis(data["data"], 1, -1))
+        np.testing.assert_array_equal(restored["seg"], data["seg"])
+
+    def test_write_unsupported(self):
+        # no dict
+        self.assertIsNone(self.pool.write(np.zeros(3)))
+        # no arrays
+        self.assertIsNone(self.pool.write({"name": ["a"]}))
+        # too large
+        self.assertIsNone(self.pool.write({"data": np.zeros(1024)}))
+
+    def test_release(self):
+        data = {"data": np.zeros(16)}
+
+        restored = [self.pool.read(self.pool.write(data)) for _ in range(2)]
+
+        # all segments are in use
+        self.assertIsNone(self.pool.write(data))
+
+        # views keep the segment in use
+        view = restored.pop()["data"][1:]
+        gc.collect()
+        self.assertIsNone(self.pool.write(data))
+
+        # segment is released once the last view has been collected
+        del view
+        gc.collect()
+        self.assertIsNotNone(self.pool.write(data))
+
+        # explicit release
+        self.pool.release(0)
+        self.assertEqual(self.pool.write(data).segment_idx, 0)
+
+    def test_close(self):
+        names = [segment.name for segment in self.pool._segments]
+        restored = self.pool.read(self.pool.write({"data": np.ones(4)}))
+
+        self.pool.close()
+        self.assertEqual(self.pool._segments, [])
+
+        # batches still referencing a segment stay valid
+        np.testing.assert_array_equal(restored["data"], np.ones(4))
+
+        # segments are unlinked by the owning process
+        from multiprocessing.shared_memory import SharedMemory
+        for name in names:
+            with self.assertRaises(FileNotFoundError):
+                SharedMemory(name=name)
+
+
+if __name__ == '__main__':
+    unittest.main()